@@ -1,32 +1,420 @@
 import os
 import sys
+import io
+import json
+import hashlib
 import traceback
-from csv import Sniffer
+import importlib.util
+from csv import Sniffer, Error
+from collections.abc import MutableMapping
 import wx
 import wx.py.dispatcher as dp
+import numpy as np
 import pandas as pd
 from bsmutility.pymgr_helpers import Gcm
 from bsmutility.utility import build_tree
 from bsmutility.fileviewbase import TreeCtrlNoTimeStamp, PanelNotebookBase, FileViewBase
+from .filecache import acquire, retain, release, overlay
+from .lazytree import LazyTreeMixin
+from .live import LiveTreeMixin, LivePanelMixin
 
-def read_csv(filename):
+# pyarrow engine is much faster to parse the large csv file
+pyarrow_engine = importlib.util.find_spec('pyarrow') is not None
+
+def sniff_csv(filename):
+    """get the delimiter from the header line"""
     sep = ','
     with open(filename, encoding='utf-8') as fp:
         line = fp.readline()
-        s = Sniffer()
-        d = s.sniff(line)
-        sep = d.delimiter
-    csv = pd.read_csv(filename, sep=sep)
-    d = {}
-    for c in csv:
-        d[c] = csv[c]
-    return build_tree(build_tree(csv), '->')
+        try:
+            d = Sniffer().sniff(line)
+            sep = d.delimiter
+        except Error:
+            pass
+    return sep
+
+class CsvColumn:
+    """a column in csv file, which is only parsed when it is accessed"""
+
+    def __init__(self, csv, index):
+        self.csv = csv
+        self.index = index
+
+    @property
+    def name(self):
+        return self.csv.columns[self.index]
+
+    @property
+    def dtype(self):
+        # the dtype inferred from the sample rows
+        return self.csv.dtypes[self.index]
+
+    @property
+    def shape(self):
+        d = self.csv.cache.get(self.index, None)
+        return None if d is None else d.shape
+
+    @property
+    def ndim(self):
+        return 1
+
+    def loaded(self):
+        return self.index in self.csv.cache
+
+    def read(self):
+        return self.csv.get(self.index)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.read(), dtype=dtype)
+
+    def __len__(self):
+        return len(self.read())
+
+    def __getitem__(self, key):
+        return self.read()[key]
+
+    def __repr__(self):
+        return f'<csv column "{self.name}": dtype {self.dtype}>'
+
+def count_lines(filename, stop=None, block_size=2**24):
+    """number of lines in the file (before offset stop), without parsing it"""
+    lines, last = 0, b'\n'
+    with open(filename, 'rb') as fp:
+        while stop is None or fp.tell() < stop:
+            size = block_size if stop is None else min(block_size, stop - fp.tell())
+            block = fp.read(size)
+            if not block:
+                break
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return lines
+
+class CsvFile:
+    """
+    Only read the header (and a few rows to infer the dtype) of the csv file,
+    and parse the columns when they are accessed.
+
+    For the file larger than memmap_size, the numeric columns are converted
+    to the memory-mapped npy files in cache_dir, so only the pages touched
+    are loaded into memory.
+    """
+    # number of rows to infer the dtype of the columns
+    sample_rows = 1000
+    # parse the float columns as float32 to save memory
+    float32 = False
+    # the csv file larger than memmap_size will be converted to memory-mapped
+    # column store
+    memmap_size = 2*1024**3
+    # number of rows to parse at a time when converting the file
+    chunksize = 100000
+    cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'bsmplot', 'csv')
+
+    def __init__(self, filename, float32=None, memmap=None, follow=False):
+        self.filename = filename
+        self.sep = sniff_csv(filename)
+        if float32 is not None:
+            self.float32 = float32
+        sample = pd.read_csv(filename, sep=self.sep, nrows=self.sample_rows)
+        self.columns = list(sample.columns)
+        self.dtypes = [sample[c].dtype for c in sample]
+        # the parsed columns, index -> numpy array
+        self.cache = {}
+
+        # follow mode, only the rows before offset (the end of the last
+        # complete line) are parsed; the rows appended later are parsed by
+        # update()
+        self.follow = follow
+        self.offset = None
+        self.rows = None
+        # the buffer of the parsed columns in follow mode, which grows as the
+        # rows are appended
+        self._buffers = {}
+        if follow:
+            self.offset = self._last_line_end(0)
+            self.rows = self._count_rows(self.offset)
+            return
+
+        if memmap is None:
+            memmap = os.path.getsize(filename) > self.memmap_size
+        if memmap:
+            self.cache.update(self.open_store())
+
+    def store_path(self):
+        name = hashlib.sha1(os.path.abspath(self.filename).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def _store_meta(self):
+        stat = os.stat(self.filename)
+        return {'filename': os.path.abspath(self.filename), 'size': stat.st_size,
+                'mtime': stat.st_mtime, 'float32': self.float32}
+
+    def open_store(self):
+        """open the memory-mapped column store, build it if it is out of date"""
+        path = self.store_path()
+        meta = None
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as fp:
+                meta = json.load(fp)
+        except (OSError, ValueError):
+            pass
+        if meta is None or any(meta.get(k) != v for k, v in self._store_meta().items()):
+            meta = self.build_store(path)
+        rows = meta['rows']
+        columns = {int(i): np.load(os.path.join(path, f), mmap_mode='r')[:rows]
+                   for i, f in meta['columns'].items()}
+        # the dtype may change after the sample rows, e.g., int column with
+        # missing value, or the non-numeric column parsed on demand
+        for i, d in enumerate(self.dtypes):
+            if i in columns:
+                self.dtypes[i] = columns[i].dtype
+            elif pd.api.types.is_numeric_dtype(d):
+                self.dtypes[i] = np.dtype(object)
+        return columns
+
+    def build_store(self, path):
+        """stream the csv file in chunks, and save the numeric columns to npy files"""
+        os.makedirs(path, exist_ok=True)
+        meta_file = os.path.join(path, 'meta.json')
+        if os.path.isfile(meta_file):
+            os.remove(meta_file)
+        # the number of lines is the upper bound of the number of rows (e.g.,
+        # empty lines, or line break in quoted field)
+        rows = max(count_lines(self.filename) - 1, 0)
+        indices = [i for i, d in enumerate(self.dtypes) if pd.api.types.is_numeric_dtype(d)]
+
+        def _open(i, dtype):
+            f = os.path.join(path, f'{i}.{np.dtype(dtype).str[1:]}.npy')
+            return f, np.lib.format.open_memmap(f, mode='w+', dtype=dtype, shape=(rows,))
 
-class CsvTree(TreeCtrlNoTimeStamp):
-    pass
+        columns = {}
+        for i in indices:
+            columns[i] = _open(i, self._dtype(i) or self.dtypes[i])
+        n = 0
+        # not force the sampled dtype, as the rows not sampled may not match it
+        for chunk in pd.read_csv(self.filename, sep=self.sep, usecols=indices,
+                                 chunksize=self.chunksize):
+            m = len(chunk)
+            for i in list(columns):
+                f, d = columns[i]
+                v = chunk[self.columns[i]].to_numpy()
+                if not pd.api.types.is_numeric_dtype(v.dtype):
+                    # not numeric any more, leave it to be parsed on demand
+                    columns.pop(i)
+                    del d
+                    os.remove(f)
+                    continue
+                if not np.can_cast(v.dtype, d.dtype, 'same_kind'):
+                    # e.g., int column with missing value
+                    f2, d2 = _open(i, np.float32 if self.float32 else np.float64)
+                    d2[:n] = d[:n]
+                    columns.pop(i)
+                    del d
+                    os.remove(f)
+                    columns[i] = f, d = f2, d2
+                d[n:n+m] = v
+            n += m
+        for _, d in columns.values():
+            d.flush()
+        columns = {i: os.path.basename(f) for i, (f, _) in columns.items()}
+        meta = dict(self._store_meta(), rows=n, columns=columns)
+        # write meta file last, so an interrupted conversion will be redone
+        with open(meta_file, 'w', encoding='utf-8') as fp:
+            json.dump(meta, fp)
+        return meta
 
+    def _dtype(self, index):
+        # only force the dtype of the float columns, as the int column may
+        # have missing values in the rows not sampled
+        dtype = self.dtypes[index]
+        if pd.api.types.is_float_dtype(dtype):
+            return np.float32 if self.float32 else np.float64
+        return None
 
-class CsvPanel(PanelNotebookBase):
+    def load(self, indices):
+        """parse the columns (not parsed yet) in one pass"""
+        indices = sorted(set(i for i in indices if i not in self.cache))
+        if not indices:
+            return
+        names = [self.columns[i] for i in indices]
+        dtype = {n: self._dtype(i) for n, i in zip(names, indices) if self._dtype(i)}
+        # pyarrow engine doesn't support the integer column positions
+        kwargs = {'sep': self.sep, 'usecols': names}
+        if self.follow:
+            # not parse the rows appended after the last update
+            kwargs['nrows'] = self.rows
+        elif pyarrow_engine:
+            kwargs['engine'] = 'pyarrow'
+        try:
+            df = pd.read_csv(self.filename, dtype=dtype, **kwargs)
+        except ValueError:
+            # the rows not sampled may not match the inferred dtype, or the
+            # options are not supported by pyarrow engine; retry with the
+            # default engine and dtype
+            kwargs.pop('engine', None)
+            df = pd.read_csv(self.filename, **kwargs)
+        for i, n in zip(indices, names):
+            if self.follow:
+                self._append(i, df[n].to_numpy())
+            else:
+                self.cache[i] = df[n].to_numpy()
+
+    def _last_line_end(self, start, block_size=2**16):
+        # the offset after the last complete line since start
+        end = os.path.getsize(self.filename)
+        with open(self.filename, 'rb') as fp:
+            # search the line break backwards
+            while end > start:
+                pos = max(start, end - block_size)
+                fp.seek(pos)
+                i = fp.read(end - pos).rfind(b'\n')
+                if i >= 0:
+                    return pos + i + 1
+                end = pos
+        return start
+
+    def _count_rows(self, stop):
+        # number of rows before offset stop; count them with the parser, as
+        # the number of lines is off with the empty lines or the line breaks
+        # in quoted fields
+        with open(self.filename, 'rb') as fp:
+            block = fp.read(stop)
+        rows = 0
+        try:
+            for chunk in pd.read_csv(io.BytesIO(block), sep=self.sep, usecols=[0],
+                                     chunksize=self.chunksize):
+                rows += len(chunk)
+        except pd.errors.EmptyDataError:
+            pass
+        return rows
+
+    def _append(self, index, values):
+        # append values to the column, and double the buffer if needed, so
+        # the copy is amortized
+        buf = self._buffers.get(index, None)
+        num = len(self.cache[index]) if index in self.cache else 0
+        dtype = values.dtype if buf is None else np.result_type(buf.dtype, values.dtype)
+        total = num + len(values)
+        if buf is None or total > len(buf) or dtype != buf.dtype:
+            tmp = np.empty(max(total, 2*num, 1024), dtype=dtype)
+            if num:
+                tmp[:num] = buf[:num]
+            buf = tmp
+            self._buffers[index] = buf
+        buf[num:total] = values
+        self.cache[index] = buf[:total]
+
+    def update(self):
+        """parse the rows appended since last update, return the number of new rows"""
+        if not self.follow:
+            return 0
+        if os.path.getsize(self.filename) <= self.offset:
+            return 0
+        end = self._last_line_end(self.offset)
+        if end <= self.offset:
+            # no complete line yet
+            return 0
+        with open(self.filename, 'rb') as fp:
+            fp.seek(self.offset)
+            block = fp.read(end - self.offset)
+        # only parse the columns already loaded, with the known dtype
+        indices = sorted(self.cache) or [0]
+        dtype = {i: self.cache[i].dtype for i in indices if i in self.cache and \
+                 pd.api.types.is_numeric_dtype(self.cache[i].dtype)}
+        kwargs = {'sep': self.sep, 'header': None, 'usecols': indices,
+                  'names': range(len(self.columns))}
+        try:
+            df = pd.read_csv(io.BytesIO(block), dtype=dtype, **kwargs)
+        except ValueError:
+            df = pd.read_csv(io.BytesIO(block), **kwargs)
+        for i in indices:
+            if i in self.cache:
+                self._append(i, df[i].to_numpy())
+        self.offset = end
+        self.rows += len(df)
+        return len(df)
+
+    def get(self, index):
+        if index not in self.cache:
+            self.load([index])
+        return self.cache[index]
+
+    def tree(self):
+        data = {c: CsvColumn(self, i) for i, c in enumerate(self.columns)}
+        return build_tree(build_tree(data), '->')
+
+def read_csv(filename, float32=None, memmap=None):
+    return CsvFile(filename, float32=float32, memmap=memmap).tree()
+
+def _columns(d):
+    # all the csv columns in dict d
+    if isinstance(d, CsvColumn):
+        return [d]
+    if isinstance(d, MutableMapping):
+        return [c for v in d.values() for c in _columns(v)]
+    return []
+
+def load_columns(columns):
+    """parse the columns from the same file in one pass"""
+    columns = [c for c in columns if isinstance(c, CsvColumn)]
+    for csv in set(c.csv for c in columns):
+        csv.load([c.index for c in columns if c.csv is csv])
+
+def read_tree(d):
+    """parse all the columns in the tree, and return the tree of numpy arrays"""
+    def _read(d):
+        if isinstance(d, CsvColumn):
+            return d.read()
+        if isinstance(d, MutableMapping):
+            return {k: _read(v) for k, v in d.items()}
+        return d
+    # parse the columns in one pass
+    load_columns(_columns(d))
+    return _read(d)
+
+class CsvTree(LiveTreeMixin, LazyTreeMixin, TreeCtrlNoTimeStamp):
+    lazy_types = (CsvColumn,)
+    live_signal = 'csvs.retrieve'
+
+    def __init__(self, *args, **kwargs):
+        TreeCtrlNoTimeStamp.__init__(self, *args, **kwargs)
+        # the CsvFile in follow mode
+        self.InitLive()
+
+    def RefreshLive(self):
+        # parse the rows appended since last refresh
+        if self.live is None or not self.live.update():
+            return False
+        dp.send('graph.data_updated')
+        return True
+
+    def GetLiveData(self, path):
+        d = self.GetItemDataFromPath(path)
+        if d is None or self._is_folder(d):
+            return None
+        return d
+
+    def PlotItem(self, item, confirm=True):
+        line = super().PlotItem(item, confirm=confirm)
+        if line is None or self.ItemHasChildren(item):
+            return line
+        if self.live is not None:
+            self.TraceLive(line, self.GetItemPath(item))
+        return line
+
+    def GetItemExportData(self, item):
+        # parse all the columns to export in one pass
+        if self.ItemHasChildren(item):
+            columns = _columns(self.GetItemData(item))
+        else:
+            paths = [self.GetItemPath(s) for s in self.GetSelections() or [item]]
+            columns = [self.GetItemLazyDataFromPath(p) for p in paths]
+        load_columns(columns)
+        return super().GetItemExportData(item)
+
+
+class CsvPanel(LivePanelMixin, PanelNotebookBase):
     Gcc = Gcm()
 
     def __init__(self, parent, filename=None):
@@ -34,6 +422,8 @@ class CsvPanel(PanelNotebookBase):
 
         self.Bind(wx.EVT_TEXT, self.OnDoSearch, self.search)
 
+        self.InitLive()
+
     def init_pages(self):
         # data page
         panel, self.search, self.tree = self.CreatePageWithSearch(CsvTree)
@@ -46,12 +436,37 @@ class CsvPanel(PanelNotebookBase):
         """load the csv file"""
         u = data
         if u is None:
-            u = self.open(filename)
+            if self.tree.live is not None:
+                csv = CsvFile(filename, memmap=False, follow=True)
+                self.tree.SetLive(csv)
+                u = csv.tree()
+            else:
+                u = self.open(filename)
+        else:
+            retain(u)
+        # release the previous file
+        self.close()
         self.csv = u
-        self.tree.Load(u, filename)
+        # the tree only changes its own view of the shared data
+        self.tree.Load(overlay(u), filename)
 
         super().doLoad(filename, add_to_history=add_to_history and u is not None, data=data)
 
+    def close(self):
+        if self.csv:
+            release(self.csv)
+        self.csv = None
+
+    def Destroy(self):
+        self.timer.Stop()
+        self.close()
+        super().Destroy()
+
+    def OpenLive(self, live):
+        csv = CsvFile(self.filename, memmap=False, follow=live)
+        self.tree.SetLive(csv if live else None)
+        return csv.tree()
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -63,7 +478,7 @@ class CsvPanel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return read_csv(filename)
+        return acquire(filename, read_csv)
 
 
 class CSV(FileViewBase):
@@ -101,7 +516,8 @@ class CSV(FileViewBase):
                 csv = read_csv(filename)
             except:
                 traceback.print_exc(file=sys.stdout)
-        return csv
+        # return the numpy arrays, not the lazy columns
+        return read_tree(csv)
 
 def bsm_initialize(frame, **kwargs):
     CSV.initialize(frame)
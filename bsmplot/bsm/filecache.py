@@ -0,0 +1,202 @@
+"""
+persistent cache of the parsed files (e.g., VCD and ULog), and the registry
+of the files loaded by the panels
+"""
+import os
+import sys
+import pickle
+import shutil
+import hashlib
+import tempfile
+import traceback
+import numpy as np
+import pandas as pd
+from ..version import __version__
+
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'bsmplot', 'files')
+# max total size (in bytes) of the cache, the least recently used entries will
+# be removed when it is exceeded
+max_cache_size = 4*1024**3
+# the numeric arrays larger than min_npy_size (in bytes) are saved as npy files
+min_npy_size = 4096
+# the version of the cache layout, increase it when the layout changes, so
+# the old entries are not loaded
+cache_format = 1
+
+class _Pickler(pickle.Pickler):
+    """save the large numeric arrays as npy files, and pickle the rest"""
+
+    def __init__(self, fp, path):
+        super().__init__(fp, protocol=pickle.HIGHEST_PROTOCOL)
+        self.path = path
+        self.saved = {}
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.kind not in 'biufcmM' or \
+           obj.nbytes < min_npy_size:
+            return None
+        if id(obj) not in self.saved:
+            name = f'{len(self.saved)}.npy'
+            np.save(os.path.join(self.path, name), obj)
+            self.saved[id(obj)] = name
+        return self.saved[id(obj)]
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, fp, path):
+        super().__init__(fp)
+        self.path = path
+
+    def persistent_load(self, pid):
+        # copy-on-write memory map, so only the pages used are read from
+        # disk, and the array is still writable
+        return np.load(os.path.join(self.path, pid), mmap_mode='c')
+
+def cache_key(filename, loader, version=0):
+    """the key of the file, which changes when the file or the loader changes"""
+    stat = os.stat(filename)
+    key = [os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+           loader.__module__, loader.__qualname__, version, __version__, cache_format]
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+def _load(path):
+    filename = os.path.join(path, 'data.pkl')
+    if not os.path.isfile(filename):
+        return None
+    try:
+        # update the access time for LRU
+        os.utime(path)
+        with open(filename, 'rb') as fp:
+            fmt, data = _Unpickler(fp, path).load()
+        if fmt == cache_format:
+            return data
+        print(f'Invalid cache format {fmt}: {path}')
+        shutil.rmtree(path, ignore_errors=True)
+    except:
+        traceback.print_exc(file=sys.stdout)
+        shutil.rmtree(path, ignore_errors=True)
+    return None
+
+def _save(path, data):
+    os.makedirs(cache_dir, exist_ok=True)
+    # save to a temporary folder first, so a partial entry is never loaded
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp')
+    try:
+        with open(os.path.join(tmp, 'data.pkl'), 'wb') as fp:
+            _Pickler(fp, tmp).dump((cache_format, data))
+        os.replace(tmp, path)
+    except:
+        traceback.print_exc(file=sys.stdout)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _entry_size(path):
+    return sum(f.stat().st_size for f in os.scandir(path) if f.is_file())
+
+def trim(max_size=None):
+    """remove the least recently used entries, until the cache fits max_size"""
+    if max_size is None:
+        max_size = max_cache_size
+    if not os.path.isdir(cache_dir):
+        return
+    entries = [e for e in os.scandir(cache_dir) if e.is_dir() and not e.name.startswith('.')]
+    entries = sorted(entries, key=lambda e: e.stat().st_mtime)
+    sizes = [_entry_size(e.path) for e in entries]
+    total = sum(sizes)
+    for e, size in zip(entries, sizes):
+        if total <= max_size:
+            break
+        shutil.rmtree(e.path, ignore_errors=True)
+        if not os.path.exists(e.path):
+            total -= size
+
+def clear():
+    """remove all the cached files"""
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+def cached_load(filename, loader, version=0):
+    """
+    return loader(filename), which is loaded from the cache if the file has
+    been loaded before; otherwise, the result is saved to the cache.
+    """
+    try:
+        path = os.path.join(cache_dir, cache_key(filename, loader, version))
+    except OSError:
+        return loader(filename)
+    data = _load(path)
+    if data is not None:
+        return data
+    data = loader(filename)
+    if data:
+        _save(path, data)
+        trim()
+    return data
+
+# the files loaded in this process, which are shared by all the panels
+_loaded = {}
+
+def _loaded_key(filename, loader):
+    stat = os.stat(filename)
+    return (os.path.normcase(os.path.abspath(filename)), stat.st_size,
+            stat.st_mtime_ns, loader.__module__, loader.__qualname__)
+
+def acquire(filename, loader, close=None, cache=False):
+    """
+    return loader(filename), which is shared by all the users in the process;
+    call release(data) when it is not used any more, and close(data) will be
+    called after it is released by all the users.
+    """
+    try:
+        key = _loaded_key(filename, loader)
+    except OSError:
+        # e.g., glob pattern, not shared
+        return cached_load(filename, loader) if cache else loader(filename)
+    entry = _loaded.get(key, None)
+    if entry is not None:
+        entry['refs'] += 1
+        return entry['data']
+    data = cached_load(filename, loader) if cache else loader(filename)
+    if data:
+        _loaded[key] = {'data': data, 'refs': 1, 'close': close}
+    return data
+
+def overlay(data):
+    """
+    return a copy-on-write view of the shared data (e.g., returned by
+    acquire()), so the changes (e.g., deleted or converted items) in one
+    panel are not seen by the others. The dicts are copied (but not the
+    values), the DataFrames are copied shallowly, and the lazy mappings
+    (e.g., H5Group) return their own views.
+    """
+    if hasattr(data, 'overlay'):
+        return data.overlay()
+    if isinstance(data, pd.DataFrame):
+        return data.copy(deep=False)
+    if isinstance(data, dict):
+        return {k: overlay(v) for k, v in data.items()}
+    return data
+
+def retain(data):
+    """
+    add a user to the data returned by acquire() (e.g., passed to another
+    panel); return False if it is not shared.
+    """
+    for entry in _loaded.values():
+        if entry['data'] is data:
+            entry['refs'] += 1
+            return True
+    return False
+
+def release(data):
+    """
+    release the data returned by acquire(); return False if it is not shared
+    (e.g., not loaded by acquire()), so the caller shall close it.
+    """
+    for key, entry in _loaded.items():
+        if entry['data'] is data:
+            entry['refs'] -= 1
+            if entry['refs'] <= 0:
+                _loaded.pop(key)
+                if entry['close'] is not None:
+                    entry['close'](data)
+            return True
+    return False
@@ -1,5 +1,6 @@
 import wx
 import wx.py.dispatcher as dp
+import numpy as np
 import matplotlib
 matplotlib.use('module://bsmplot.bsm.bsmbackend')
 import matplotlib.pyplot as plt
@@ -51,6 +52,74 @@ class DataDropTarget(wx.DropTarget):
         #self.frame.OnDragOver(x, y, d)
         return d
 
+class TraceBuffer:
+    """
+    The data of a traced line, which only appends the new samples since
+    last_frame_id. The buffer is preallocated, and the oldest samples are
+    dropped when there are more than maxlen samples.
+    """
+
+    def __init__(self, maxlen=None):
+        self.maxlen = maxlen
+        self.x = None
+        self.y = None
+        self.start = 0
+        self.end = 0
+        self.last_frame_id = -1
+
+    def _alloc(self, size, x, y):
+        if self.maxlen:
+            # compact the buffer once every maxlen samples
+            size = max(size, 2*self.maxlen)
+        else:
+            size = max(size, 1024)
+        return np.empty(size, dtype=x.dtype), np.empty(size, dtype=y.dtype)
+
+    def set(self, x, y, last_frame_id):
+        x, y = np.asarray(x), np.asarray(y)
+        if self.maxlen:
+            x, y = x[-self.maxlen:], y[-self.maxlen:]
+        self.x, self.y = self._alloc(2*len(y), x, y)
+        self.x[:len(x)] = x
+        self.y[:len(y)] = y
+        self.start, self.end = 0, len(y)
+        self.last_frame_id = last_frame_id
+
+    def append(self, x, y, last_frame_id):
+        x, y = np.asarray(x), np.asarray(y)
+        if self.x is None:
+            self.set(x, y, last_frame_id)
+            return
+        self.last_frame_id = last_frame_id
+        if self.maxlen:
+            x, y = x[-self.maxlen:], y[-self.maxlen:]
+        k = len(y)
+        if k == 0:
+            return
+        num = self.end - self.start
+        if self.maxlen:
+            num = min(num, self.maxlen - k)
+        dtype_x = np.result_type(self.x.dtype, x.dtype)
+        dtype_y = np.result_type(self.y.dtype, y.dtype)
+        if self.end + k > len(self.x) or dtype_x != self.x.dtype or dtype_y != self.y.dtype:
+            # move the samples to the front (and grow the buffer if needed)
+            bx, by = self.x, self.y
+            if num + k > len(self.x) or dtype_x != self.x.dtype or dtype_y != self.y.dtype:
+                bx, by = self._alloc(2*(num + k), x.astype(dtype_x, copy=False),
+                                     y.astype(dtype_y, copy=False))
+            bx[:num] = self.x[self.end-num:self.end]
+            by[:num] = self.y[self.end-num:self.end]
+            self.x, self.y = bx, by
+            self.start, self.end = 0, num
+        self.x[self.end:self.end+k] = x
+        self.y[self.end:self.end+k] = y
+        self.end += k
+        if self.maxlen:
+            self.start = max(self.start, self.end - self.maxlen)
+
+    def get(self):
+        return self.x[self.start:self.end], self.y[self.start:self.end]
+
 class MatplotPanel(MPLPanel):
 
     def __init__(self, parent, title=None, num=-1, thisFig=None):
@@ -73,18 +142,29 @@ class MatplotPanel(MPLPanel):
             for l in ax.lines:
                 if not hasattr(l, 'trace_signal'):
                     continue
-                signal, num, path = l.trace_signal
-                resp = dp.send(**l.trace_signal)
-                if not resp:
+                buf = getattr(l, 'trace_buffer', None)
+                if buf is None:
+                    buf = TraceBuffer(getattr(l, 'trace_maxlen', None))
+                    l.trace_buffer = buf
+                # only retrieve the samples since last update
+                resp = self._retrieve(l.trace_signal, buf.last_frame_id)
+                if resp is None:
                     continue
-                # ignore the zmq when different "num"
-                resp = [r for r in resp if len(r[1]) == 3 and r[1][0] is not None and r[1][1] is not None]
-                if not resp:
+                x, y, n = resp
+                if n is None or n < buf.last_frame_id:
+                    # the source has been restarted, retrieve all the data
+                    resp = self._retrieve(l.trace_signal, -1)
+                    if resp is None:
+                        continue
+                    x, y, n = resp
+                    buf.set(x, y, n)
+                elif buf.last_frame_id < 0:
+                    buf.set(x, y, n)
+                elif len(y) > 0:
+                    buf.append(x, y, n)
+                else:
                     continue
-                x, y, _ = resp[0][1]
-                if x is None or y is None:
-                    continue
-                l.set_data(x, y)
+                l.set_data(*buf.get())
                 updated = True
                 if hasattr(l, 'autorelim') and l.autorelim:
                     autorelim = True
@@ -96,6 +176,17 @@ class MatplotPanel(MPLPanel):
                 ax.autoscale_view()
         dp.send('graph.axes_updated', figure=self.figure, axes=updated_ax)
 
+    def _retrieve(self, trace_signal, last_frame_id):
+        # the source returns (x, y, n), which are the samples with frame id
+        # larger than last_frame_id, and n is the latest frame id
+        resp = dp.send(last_frame_id=last_frame_id, **trace_signal)
+        # ignore the response from the sources with different "num"
+        resp = [r[1] for r in resp or [] if isinstance(r[1], tuple) and len(r[1]) == 3 \
+                and r[1][0] is not None and r[1][1] is not None]
+        if not resp:
+            return None
+        return resp[0]
+
     def show(self):
         """show figure"""
         if self.IsShownOnScreen() is False:
@@ -9,34 +9,221 @@ import h5py
 from bsmutility.pymgr_helpers import Gcm
 from bsmutility.fileviewbase import TreeCtrlNoTimeStamp, ListCtrlBase, PanelNotebookBase, FileViewBase
 from bsmutility.autocomplete import AutocompleteTextCtrl
-from bsmutility.utility import get_tree_item_name
-
-def load_h5(filename):
-    data = {}
-    attrs = {}
-    h5 = h5py.File(filename)
-    def _get_attr(v):
-        attrs = {}
-        for k, v in v.attrs.items():
-            attrs[k] = v
-        return attrs
-
-    def _load_group(group):
-        data = {}
-        attrs = {}
-        for k, v in group.items():
-            if isinstance(v, h5py.Group):
-                data[k], attrs[k] = _load_group(v)
-            elif isinstance(v, h5py.Dataset):
-                data[k] = np.asarray(v)
-                attrs[k] = _get_attr(v)
-
-        attrs['.'] = _get_attr(group)
-
-        return data, attrs
-    data, attrs = _load_group(h5)
-    h5.close()
-    return {'h5': data}, {'h5': attrs}
+from .filecache import acquire, retain, release, overlay
+from .lazytree import LazyMapping, LazyTreeMixin
+from .live import LiveTreeMixin, LivePanelMixin
+
+def read_envelope(dset, start, stop, num, block_size=2**20):
+    """
+    read the min/max envelope of dset[start:stop] (1d) in num buckets
+
+    The dataset is read block by block, and each block is aligned to the
+    chunks on disk, so the memory is bounded by block_size (samples).
+    Return the x (index) and y, where y[2*i] and y[2*i+1] are the min and max
+    of bucket i.
+    """
+    edges = np.unique(np.linspace(start, stop, num + 1).astype(np.int64))
+    ymin = np.full(len(edges) - 1, np.nan)
+    ymax = np.full(len(edges) - 1, np.nan)
+    step = block_size
+    if dset.chunks:
+        # whole chunks per block
+        step = dset.chunks[0] * max(1, block_size // dset.chunks[0])
+    blocks = list(range((start // step + 1) * step, stop, step))
+    blocks = [start] + blocks + [stop]
+    for b0, b1 in zip(blocks[:-1], blocks[1:]):
+        block = np.asarray(dset[b0:b1], dtype=float)
+        # buckets overlapping with [b0, b1)
+        k0 = np.searchsorted(edges, b0, 'right') - 1
+        k1 = np.searchsorted(edges, b1, 'left')
+        bounds = np.clip(edges[k0:k1], b0, b1) - b0
+        ymin[k0:k1] = np.fmin(ymin[k0:k1], np.fmin.reduceat(block, bounds))
+        ymax[k0:k1] = np.fmax(ymax[k0:k1], np.fmax.reduceat(block, bounds))
+    x = np.repeat(edges[:-1], 2)
+    y = np.stack([ymin, ymax], axis=1).ravel()
+    return x, y
+
+class H5Dataset:
+    """a dataset in HDF5 file, which is only read when accessed"""
+
+    # max number of the cached envelopes
+    max_envelope_cache = 16
+
+    def __init__(self, dset):
+        self.dset = dset
+        self._envelope = {}
+
+    @property
+    def shape(self):
+        return self.dset.shape
+
+    @property
+    def dtype(self):
+        return self.dset.dtype
+
+    @property
+    def ndim(self):
+        return self.dset.ndim
+
+    @property
+    def chunks(self):
+        return self.dset.chunks
+
+    @property
+    def attrs(self):
+        return dict(self.dset.attrs)
+
+    def refresh(self):
+        # SWMR mode, update the shape of the dataset appended by the writer
+        self.dset.refresh()
+
+    def read(self):
+        return self.dset[()]
+
+    def __getitem__(self, key):
+        # only read the slice from file
+        return self.dset[key]
+
+    def __len__(self):
+        return len(self.dset)
+
+    def envelope(self, start, stop, num):
+        # the min/max envelope of [start, stop) in num buckets
+        key = (start, stop, num)
+        if key not in self._envelope:
+            if len(self._envelope) >= self.max_envelope_cache:
+                self._envelope.pop(next(iter(self._envelope)))
+            self._envelope[key] = read_envelope(self, start, stop, num)
+        return self._envelope[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.read(), dtype=dtype)
+
+    def __repr__(self):
+        return f'<HDF5 dataset "{self.dset.name}": shape {self.shape}, type "{self.dtype.str}">'
+
+class H5Field(H5Dataset):
+    """a field of the compound dataset"""
+
+    def __init__(self, compound, name):
+        super().__init__(compound.dset)
+        self.compound = compound
+        self.name = name
+
+    @property
+    def shape(self):
+        # the field may be a sub-array
+        return self.dset.shape + self.dset.dtype.fields[self.name][0].shape
+
+    @property
+    def dtype(self):
+        return self.dset.dtype.fields[self.name][0].base
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def attrs(self):
+        return {}
+
+    def refresh(self):
+        self.compound.refresh()
+
+    def read(self):
+        if self.compound.records is not None:
+            # view of the field in the record array
+            return self.compound.records[self.name]
+        # only read the bytes of the field
+        return self.dset.fields(self.name)[()]
+
+    def __getitem__(self, key):
+        if self.compound.records is not None:
+            return self.compound.records[self.name][key]
+        return self.dset.fields(self.name)[key]
+
+    def __repr__(self):
+        return f'<HDF5 field "{self.dset.name}.{self.name}": shape {self.shape}, type "{self.dtype.str}">'
+
+class H5Compound(LazyMapping):
+    """a compound dataset, each field is shown as a child"""
+    leaf_types = (H5Field,)
+
+    def __init__(self, dset):
+        super().__init__()
+        self.dset = dset
+        # the record array, only read when all fields are required (e.g.,
+        # export); then the fields are the views of it
+        self.records = None
+
+    @property
+    def attrs(self):
+        return dict(self.dset.attrs)
+
+    def refresh(self):
+        self.dset.refresh()
+        self.records = None
+
+    def _keys(self):
+        return self.dset.dtype.names
+
+    def _has(self, key):
+        return key in self.dset.dtype.fields
+
+    def _wrap(self, key):
+        return H5Field(self, key)
+
+    def read(self):
+        if self.records is None:
+            self.records = self.dset[()]
+        return super().read()
+
+    def __repr__(self):
+        return f'<HDF5 compound dataset "{self.dset.name}": shape {self.dset.shape}>'
+
+class H5Group(LazyMapping):
+    """a group in HDF5 file, the children are listed from the metadata"""
+    leaf_types = (H5Dataset,)
+
+    def __init__(self, group):
+        super().__init__()
+        self.group = group
+
+    @property
+    def attrs(self):
+        return dict(self.group.attrs)
+
+    def _keys(self):
+        return self.group.keys()
+
+    def _has(self, key):
+        return key in self.group
+
+    def _wrap(self, key):
+        v = self.group[key]
+        if isinstance(v, h5py.Group):
+            return H5Group(v)
+        if isinstance(v, h5py.Dataset):
+            if v.dtype.names:
+                return H5Compound(v)
+            return H5Dataset(v)
+        return v
+
+    def __repr__(self):
+        return f'<HDF5 group "{self.group.name}" ({len(self)} members)>'
+
+    def close(self):
+        self.group.file.close()
+
+def load_h5(filename, swmr=False):
+    # only the metadata is loaded, the dataset is read when accessed; so keep
+    # the file open
+    if swmr:
+        # follow the file appended by a writer in SWMR mode
+        h5 = h5py.File(filename, 'r', libver='latest', swmr=True)
+    else:
+        h5 = h5py.File(filename, 'r')
+    return {'h5': H5Group(h5)}
 
 class InfoListCtrl(ListCtrlBase):
 
@@ -100,54 +287,144 @@ class AttrsDialog(wx.Dialog):
         pattern = self.search.GetValue()
         self.infoList.Fill(pattern)
 
-class H5Tree(TreeCtrlNoTimeStamp):
-    ID_SHOW_ATTRIBUTES = wx.NewIdRef()
+class EnvelopeLine:
+    """
+    Update the line plotted from the envelope of a large dataset when the
+    x-axis is changed: the visible range is re-read at full resolution if it
+    is small enough, otherwise its envelope is read at the axes resolution.
+    """
+
+    def __init__(self, line, dset, max_samples):
+        self.line = line
+        self.dset = dset
+        self.max_samples = max_samples
+        self.visible = None
+        self.cid = line.axes.callbacks.connect('xlim_changed', self.OnXlimChanged)
+        # the callback registry only keeps a weak reference
+        line.h5_envelope = self
+
+    def OnXlimChanged(self, ax):
+        if self.line.axes is None:
+            # the line has been removed
+            ax.callbacks.disconnect(self.cid)
+            return
+        lo, hi = ax.get_xlim()
+        n = len(self.dset)
+        start = int(np.clip(np.floor(lo), 0, n))
+        stop = int(np.clip(np.ceil(hi) + 1, 0, n))
+        num = max(int(ax.bbox.width), 1)
+        if stop <= start or self.visible == (start, stop, num):
+            return
+        self.visible = (start, stop, num)
+        if stop - start <= self.max_samples:
+            x, y = np.arange(start, stop), self.dset[start:stop]
+        else:
+            x, y = self.dset.envelope(start, stop, num)
+        self.line.set_data(x, y)
+        ax.figure.canvas.draw_idle()
 
-    def __init__(self, parent, style=wx.TR_DEFAULT_STYLE):
-        super().__init__(parent, style)
-        self.attrs = {}
+class H5Tree(LiveTreeMixin, LazyTreeMixin, TreeCtrlNoTimeStamp):
+    ID_SHOW_ATTRIBUTES = wx.NewIdRef()
+    # 1d dataset with more samples is plotted with its min/max envelope
+    max_plot_samples = 10**6
+    # number of buckets of the envelope for the overview plot
+    plot_buckets = 2000
+    lazy_types = (H5Dataset,)
+    live_signal = 'h5.retrieve'
+
+    def __init__(self, *args, **kwargs):
+        TreeCtrlNoTimeStamp.__init__(self, *args, **kwargs)
+        # live mode (SWMR), the plotted datasets are kept in memory, and only
+        # the newly appended rows are read when refreshed
+        self.InitLive()
+        self._live = {}
 
-    def GetItemDataFromPath(self, path):
-        d = super().GetItemDataFromPath(path)
-        if not self._is_folder(d):
-            d = np.array(d)
-        return d
+    def Load(self, data, filename=None):
+        self._live = {}
+        super().Load(data, filename)
+
+    def SetLive(self, live):
+        self.live = live
+        self._live = {}
+
+    def GetLiveData(self, path):
+        key = tuple(path)
+        if key not in self._live:
+            d = self.GetItemLazyDataFromPath(path)
+            if not isinstance(d, H5Dataset):
+                return None
+            buf = d.read()
+            self._live[key] = [d, buf, len(buf)]
+        _, buf, num = self._live[key]
+        return buf[:num]
+
+    def RefreshLive(self):
+        # read the rows appended since last refresh
+        updated = False
+        for v in self._live.values():
+            d, buf, num = v
+            d.refresh()
+            total = d.shape[0]
+            if total <= num:
+                continue
+            if total > len(buf):
+                # double the buffer, so the copy is amortized
+                tmp = np.empty((max(total, 2*len(buf)),) + buf.shape[1:], dtype=buf.dtype)
+                tmp[:num] = buf[:num]
+                buf = tmp
+            buf[num:total] = d[num:total]
+            v[1], v[2] = buf, total
+            updated = True
+        if updated:
+            dp.send('graph.data_updated')
+        return updated
 
     def get_children(self, item):
         children = super().get_children(item)
         children = [c for c in children if c['label'] != 'ncattrs']
         return children
 
-    def Load(self, data, filename=None):
-        # data: [data, attrs]
-        self.attrs = data[1]
-        super().Load(data[0], filename)
+    def _is_envelope(self, item):
+        # check if the item shall be plotted with its envelope
+        if self.live or self.ItemHasChildren(item) or self.HasXaxisData(item):
+            return False
+        d = self.GetItemLazyDataFromPath(self.GetItemPath(item))
+        return isinstance(d, H5Dataset) and d.ndim == 1 and \
+               np.issubdtype(d.dtype, np.number) and len(d) > self.max_plot_samples
+
+    def GetItemPlotData(self, item):
+        if self._is_envelope(item):
+            d = self.GetItemLazyDataFromPath(self.GetItemPath(item))
+            return d.envelope(0, len(d), self.plot_buckets)
+        return super().GetItemPlotData(item)
+
+    def PlotItem(self, item, confirm=True):
+        line = super().PlotItem(item, confirm=confirm)
+        if line is None or self.ItemHasChildren(item):
+            return line
+        path = self.GetItemPath(item)
+        d = self.GetItemLazyDataFromPath(path)
+        if self.live:
+            if isinstance(d, H5Dataset) and d.ndim == 1:
+                self.TraceLive(line, path)
+        elif self._is_envelope(item):
+            EnvelopeLine(line, d, self.max_plot_samples)
+        return line
 
     def GetItemAttrs(self, item):
         if item == self.GetRootItem():
             return []
 
         path = self.GetItemPath(item)
-        attrs = self.GetItemAttrsFromPath(path)
-        if self.ItemHasChildren(item):
-            return attrs.get('.', [])
-        return attrs
+        return self.GetItemAttrsFromPath(path) or []
 
     def GetItemAttrsFromPath(self, path):
         # path is an array, e.g., path = get_tree_item_path(name)
-        d = self.attrs
-        for i, p in enumerate(path):
-            if p not in d:
-                if isinstance(d, pd.DataFrame):
-                    # the name in node DataFrame is not parsed, so try the
-                    # combined name, e.g., if the column name is a[5],
-                    # get_tree_item_path will return ['a', '[5]']
-                    name = get_tree_item_name(path[i:])
-                    if name in d:
-                        return d[name]
-                return None
-            d = d[p]
-        return d
+        # the attributes are read from file when requested
+        d = self.GetItemLazyDataFromPath(path)
+        if isinstance(d, (H5Group, H5Compound, H5Dataset)):
+            return d.attrs
+        return None
 
     def GetItemMenu(self, item):
         menu = super().GetItemMenu(item)
@@ -167,14 +444,17 @@ class H5Tree(TreeCtrlNoTimeStamp):
         else:
             super().doProcessCommand(cmd, item)
 
-class H5Panel(PanelNotebookBase):
+class H5Panel(LivePanelMixin, PanelNotebookBase):
     Gcc = Gcm()
+    live_label = 'Follow the file (SWMR)'
 
     def __init__(self, parent, filename=None):
         PanelNotebookBase.__init__(self, parent, filename=filename)
 
         self.Bind(wx.EVT_TEXT, self.OnDoSearch, self.search)
 
+        self.InitLive()
+
     def init_pages(self):
         # data page
         panel, self.search, self.tree = self.CreatePageWithSearch(H5Tree)
@@ -187,16 +467,41 @@ class H5Panel(PanelNotebookBase):
         """load the HDF5 file"""
         u = data
         if data is None:
-            u = self.open(filename)
+            # close the file before opening it again
+            self.close()
+            if self.tree.live:
+                u = load_h5(filename, swmr=True)
+            else:
+                u = self.open(filename)
+        else:
+            retain(u)
+        self.close()
         self.h5 = u
         if u:
-            self.tree.Load(u, filename)
+            self.tree.Load(overlay(u), filename)
         else:
             self.tree.Load(None)
             add_to_history = False
 
         super().doLoad(filename, add_to_history=add_to_history, data=data)
 
+    def close(self):
+        if self.h5 and not release(self.h5):
+            self.h5['h5'].close()
+        self.h5 = None
+
+    def Destroy(self):
+        self.timer.Stop()
+        self.close()
+        super().Destroy()
+
+    def OpenLive(self, live):
+        # the file can't be opened in SWMR and normal mode at the same time
+        self.close()
+        data = load_h5(self.filename, swmr=live)
+        self.tree.SetLive(live)
+        return data
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -211,7 +516,7 @@ class H5Panel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return load_h5(filename)
+        return acquire(filename, load_h5, close=lambda h5: h5['h5'].close())
 
 
 class H5(FileViewBase):
@@ -240,15 +545,26 @@ class H5(FileViewBase):
 
     @classmethod
     def get(cls, num=None, filename=None, data_only=True):
+        """
+        the data of the file, which is read to memory; so it is still
+        available after the panel or the file is closed
+        """
         manager = super().get(num, filename, data_only)
         h5 = None
-        if manager:
-            h5 = manager.h5
-        elif filename:
-            try:
-                h5 = load_h5(filename)
-            except:
-                traceback.print_exc(file=sys.stdout)
+        try:
+            if manager:
+                u = manager.h5
+                if u:
+                    h5 = {'h5': u['h5'].read()}
+            elif filename:
+                # not opened by any panel, read it and close the file
+                u = load_h5(filename)
+                try:
+                    h5 = {'h5': u['h5'].read()}
+                finally:
+                    u['h5'].close()
+        except:
+            traceback.print_exc(file=sys.stdout)
         return h5
 
 def bsm_initialize(frame, **kwargs):
@@ -0,0 +1,132 @@
+"""the lazy mapping of the file, and the tree control to show it"""
+import copy
+from collections.abc import MutableMapping
+import numpy as np
+import pandas as pd
+from bsmutility.utility import get_variable_name
+from .filecache import overlay
+
+class LazyMapping(MutableMapping):
+    """
+    a mapping (e.g., a group in HDF5 file) whose children are listed from the
+    file, and only wrapped when accessed; the changes (e.g., converted items)
+    are only kept in memory.
+
+    The subclass shall implement _keys (the keys in file) and _wrap (the
+    child in file).
+    """
+    # the types of the children (not mapping) to be read in read()
+    leaf_types = ()
+
+    def __init__(self):
+        # the wrapped children in file
+        self._children = {}
+        self._added = {}
+        self._deleted = set()
+
+    def _keys(self):
+        raise NotImplementedError
+
+    def _has(self, key):
+        return key in self._keys()
+
+    def _wrap(self, key):
+        raise NotImplementedError
+
+    def _child(self, key):
+        if key not in self._children:
+            self._children[key] = self._wrap(key)
+        return self._children[key]
+
+    def __getitem__(self, key):
+        if key in self._added:
+            return self._added[key]
+        if key in self._deleted or not self._has(key):
+            raise KeyError(key)
+        return self._child(key)
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        self._added[key] = value
+
+    def __delitem__(self, key):
+        if key in self._added:
+            self._added.pop(key)
+        elif self._has(key):
+            self._deleted.add(key)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for k in self._keys():
+            if k not in self._added and k not in self._deleted:
+                yield k
+        yield from self._added
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def read(self):
+        # read all the children
+        data = {}
+        for k, v in self.items():
+            if isinstance(v, (LazyMapping,) + self.leaf_types):
+                v = v.read()
+            data[k] = v
+        return data
+
+    def overlay(self):
+        # the view of the same file, whose changes are not seen by others
+        v = copy.copy(self)
+        v._children = {k: overlay(x) for k, x in self._children.items()}
+        v._added = {k: overlay(x) for k, x in self._added.items()}
+        v._deleted = set(self._deleted)
+        return v
+
+class LazyTreeMixin:
+    """
+    the tree control to show the data with the lazy items (e.g., LazyMapping
+    and H5Dataset), which are only read when the data is required
+    """
+    # the types of the leaf items to be read in GetItemDataFromPath
+    lazy_types = ()
+    # return the lazy item (not read) in GetItemDataFromPath, e.g., when
+    # building the context menu
+    _read_data = True
+
+    def read_item(self, d):
+        return d.read()
+
+    def GetItemDataFromPath(self, path):
+        d = super().GetItemDataFromPath(path)
+        if isinstance(d, self.lazy_types) and self._read_data:
+            d = self.read_item(d)
+        return d
+
+    def GetItemLazyDataFromPath(self, path):
+        # return the lazy item, so only the required slice will be read
+        return super().GetItemDataFromPath(path)
+
+    def GetItemMenu(self, item):
+        # the menu only needs the dtype of the item, not read it
+        self._read_data = False
+        try:
+            return super().GetItemMenu(item)
+        finally:
+            self._read_data = True
+
+    def GetItemExportData(self, item):
+        if not self.ItemHasChildren(item):
+            return super().GetItemExportData(item)
+        # read all the items in the group
+        data = self.GetItemData(item)
+        if isinstance(data, LazyMapping):
+            data = data.read()
+        else:
+            data = {k: self.read_item(v) if isinstance(v, self.lazy_types) else v
+                    for k, v in data.items()}
+        values = list(data.values())
+        if values and all(isinstance(v, np.ndarray) for v in values) and \
+           self._is_all_data_same_size(values):
+            data = pd.DataFrame({k: v.flatten() for k, v in data.items()})
+        return get_variable_name(self.GetItemPath(item)), data
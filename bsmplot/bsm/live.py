@@ -0,0 +1,114 @@
+"""follow the file appended by another process (live mode)"""
+import sys
+import traceback
+import wx
+import wx.py.dispatcher as dp
+import numpy as np
+
+class LiveTreeMixin:
+    """
+    the tree control in live mode: the plotted lines retrieve the new data
+    from the tree (via live_signal) when the graph is updated.
+
+    The subclass shall set self.live (e.g., the file followed, or None if
+    not in live mode), and implement GetLiveData.
+    """
+    # the signal to retrieve the new data, e.g., 'h5.retrieve'
+    live_signal = None
+
+    def InitLive(self):
+        self.num = 0
+        self.live = None
+        dp.connect(self.RetrieveData, self.live_signal)
+
+    def SetLive(self, live):
+        self.live = live
+
+    def GetLiveData(self, path):
+        # the data of path in live mode, None if not available
+        raise NotImplementedError
+
+    def RetrieveData(self, num, path, **kwargs):
+        # return the rows after last_frame_id (number of rows retrieved), and
+        # the number of rows
+        if num != self.num or not self.live:
+            return None, None, None
+        y = self.GetLiveData(path)
+        if y is None:
+            return None, None, None
+        x = None
+        if self.x_path:
+            x = self.GetLiveData(self.x_path)
+        if x is None or len(x) != len(y):
+            x = np.arange(0, len(y))
+        since = kwargs.get('last_frame_id', -1)
+        n = len(y)
+        if 0 <= since <= n:
+            x, y = x[since:], y[since:]
+        return x, y, n
+
+    def TraceLive(self, line, path):
+        # the line retrieves the new data when the graph is updated
+        line.trace_signal = {'signal': self.live_signal, 'num': self.num, 'path': path}
+        line.autorelim = True
+
+class LivePanelMixin:
+    """
+    the panel to follow the file, which checks the new data with a timer in
+    live mode.
+
+    The subclass shall implement OpenLive.
+    """
+    ID_LIVE = wx.NewIdRef()
+    # the label of the menu item
+    live_label = 'Follow the file'
+
+    def InitLive(self):
+        self.tree.num = self.num
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
+        # period (in ms) to check the new data in live mode
+        self.live_period = self.GetOption('live_period', 500)
+
+    def OpenLive(self, live):
+        # open the file to follow it (or not), set the tree to live mode, and
+        # return the data to load
+        raise NotImplementedError
+
+    def SetLive(self, live):
+        """follow the data appended to the file"""
+        if not self.filename:
+            return
+        self.timer.Stop()
+        data = None
+        try:
+            data = self.OpenLive(live)
+        except:
+            traceback.print_exc(file=sys.stdout)
+            live = False
+            self.tree.SetLive(None)
+        self.Load(self.filename, add_to_history=False, data=data)
+        if live:
+            self.timer.Start(self.live_period)
+
+    def OnTimer(self, event):
+        try:
+            self.tree.RefreshLive()
+        except:
+            traceback.print_exc(file=sys.stdout)
+            self.timer.Stop()
+
+    def GetMoreMenu(self):
+        menu = super().GetMoreMenu()
+        menu.AppendSeparator()
+        mitem = menu.AppendCheckItem(self.ID_LIVE, self.live_label)
+        mitem.Check(bool(self.tree.live))
+        mitem.Enable(self.filename is not None)
+        return menu
+
+    def OnProcessCommand(self, event):
+        eid = event.GetId()
+        if eid == self.ID_LIVE:
+            self.SetLive(not self.tree.live)
+        else:
+            super().OnProcessCommand(event)
@@ -1,6 +1,8 @@
 import os
 import sys
 import traceback
+from collections import OrderedDict
+from collections.abc import MutableMapping
 import wx
 import wx.py.dispatcher as dp
 from scipy import io
@@ -8,6 +10,8 @@ import numpy as np
 import h5py
 from bsmutility.pymgr_helpers import Gcm
 from bsmutility.fileviewbase import TreeCtrlNoTimeStamp, ListCtrlBase, PanelNotebookBase, FileViewBase
+from .filecache import acquire, retain, release, overlay
+from .lazytree import LazyMapping, LazyTreeMixin
 
 def process_record(d):
     if hasattr(d, 'keys'):
@@ -17,48 +21,237 @@ def process_record(d):
             data[k] = process_record(d[k])
         return data
 
-    if not hasattr(d, 'dtype'):
+    if not hasattr(d, 'dtype') or np.ndim(d) == 0:
         return d
 
     if d.dtype.names is None:
-        if len(d) == 1 and d.dtype.name == 'object':
-            return process_record(d[0])
-        if hasattr(d, 'shape'):
-            if len(d.shape) <= 1 or sorted(d.shape)[-2] == 1:
-                d = np.array(d).flatten()
+        if d.size == 1 and d.dtype.name == 'object':
+            # unwrap the cell/struct element
+            return process_record(d.flat[0])
+        if len(d.shape) <= 1 or sorted(d.shape)[-2] == 1:
+            # squeeze always returns a view, even for the (strided) field of
+            # a record array
+            d = np.atleast_1d(d.squeeze())
         return d
     data = {}
     for name in d.dtype.names:
+        # d[name] is a view of the field
         data[name] = process_record(d[name])
     return data
 
-def load_mat(filename):
-    data = {'info': {}, 'data': {}}
-    try:
-        raw = io.loadmat(filename)
-    except:
-        raw = h5py.File(filename,'r')
-
-    data['info']['version'] = raw.get('__version__', '')
-    data['info']['header'] = raw.get('__header__', '')
-    data['info']['globals'] = raw.get('__globals__', '')
-
-    data['data'] = process_record(raw)
+def _nbytes(d):
+    # rough memory usage of the processed variable
+    if isinstance(d, MutableMapping):
+        return sum(_nbytes(v) for v in d.values())
+    if isinstance(d, np.ndarray):
+        return d.nbytes
+    return sys.getsizeof(d)
+
+class MatCache:
+    """LRU cache of the materialized variables, bounded by the total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.nbytes = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, loader):
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key][0]
+        value = loader(key)
+        size = _nbytes(value)
+        self.items[key] = (value, size)
+        self.nbytes += size
+        # drop the least recently used variables, but always keep the one just
+        # loaded
+        while self.nbytes > self.max_bytes and len(self.items) > 1:
+            _, (_, size) = self.items.popitem(last=False)
+            self.nbytes -= size
+        return value
+
+    def clear(self):
+        self.items.clear()
+        self.nbytes = 0
+
+class MatVariable:
+    """a variable in mat file, which is loaded when it is first accessed"""
+    # the dtype of the mat class listed by whosmat
+    mclass_dtypes = {'double': np.float64, 'single': np.float32, 'logical': np.bool_,
+                     'int8': np.int8, 'uint8': np.uint8, 'int16': np.int16,
+                     'uint16': np.uint16, 'int32': np.int32, 'uint32': np.uint32,
+                     'int64': np.int64, 'uint64': np.uint64, 'char': np.str_}
+
+    def __init__(self, mat, name, shape=None, mclass=None):
+        self.mat = mat
+        self.name = name
+        self.shape = shape
+        self.mclass = mclass
+
+    @property
+    def dtype(self):
+        # the dtype without loading the variable, e.g., for the context menu
+        if isinstance(self.mclass, np.dtype):
+            return self.mclass
+        return np.dtype(self.mclass_dtypes.get(self.mclass, object))
+
+    def load(self):
+        return self.mat.get(self.name)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.load(), dtype=dtype)
+
+    def __len__(self):
+        return len(self.load())
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __repr__(self):
+        return f'<mat variable "{self.name}": shape {self.shape}, class {self.mclass}>'
+
+class MatStruct(LazyMapping):
+    """a struct variable in mat file, whose fields are loaded when accessed"""
+
+    def __init__(self, mat, name, path=()):
+        # the changes (e.g., converted items) are saved separately, so they
+        # will not be lost when the variable is dropped from cache
+        super().__init__()
+        self.mat = mat
+        self.name = name
+        # the path of the nested struct in the variable
+        self.path = tuple(path)
+
+    def loaded(self):
+        return self.name in self.mat.cache
+
+    def _data(self):
+        d = self.mat.get(self.name)
+        for p in self.path:
+            d = d.get(p, None) if isinstance(d, MutableMapping) else None
+        return d if isinstance(d, MutableMapping) else {}
+
+    def _keys(self):
+        return self._data().keys()
+
+    def _child(self, key):
+        # only keep the nested structs (so the changes to them are kept here
+        # instead of the cached variable), not the loaded fields
+        v = self._data()[key]
+        if not isinstance(v, MutableMapping):
+            return v
+        if key not in self._children:
+            self._children[key] = MatStruct(self.mat, self.name, self.path + (key,))
+        return self._children[key]
+
+    def __repr__(self):
+        name = '.'.join((self.name,) + self.path)
+        return f'<mat struct "{name}">'
+
+class MatFile:
+    """
+    Keep the mat file open, and only load the variable when it is accessed.
+
+    For v5 mat file, the variables are listed with whosmat and loaded one by
+    one; for v7.3 (HDF5) mat file, the h5py file is kept open.
+    """
+    # max size of the materialized variables kept in memory
+    cache_size = 1024**3
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.h5 = None
+        self.cache = MatCache(self.cache_size)
+        self.info = {}
+        try:
+            self.variables = io.whosmat(filename)
+            raw = io.loadmat(filename, variable_names=[])
+        except:
+            self.variables = None
+            self.h5 = h5py.File(filename, 'r')
+            raw = self.h5
+
+        self.info['version'] = raw.get('__version__', '')
+        self.info['header'] = raw.get('__header__', '')
+        self.info['globals'] = raw.get('__globals__', '')
+
+    def _load(self, name):
+        if self.variables is None:
+            # v7.3 mat file, can't be loaded with loadmat
+            if self.h5 is None:
+                raise ValueError(f'The file is closed: {self.filename}')
+            return process_record(self.h5[name][()])
+        raw = io.loadmat(self.filename, variable_names=[name])
+        return process_record(raw[name])
+
+    def get(self, name):
+        return self.cache.get(name, self._load)
+
+    def tree(self):
+        if self.h5 is None:
+            data = {}
+            for name, shape, mclass in self.variables:
+                if name.startswith('__'):
+                    continue
+                if mclass == 'struct':
+                    data[name] = MatStruct(self, name)
+                else:
+                    data[name] = MatVariable(self, name, shape, mclass)
+            return data
+
+        def _load_group(group):
+            data = {}
+            for k, v in group.items():
+                if k.startswith('__'):
+                    continue
+                if isinstance(v, h5py.Group):
+                    data[k] = _load_group(v)
+                elif isinstance(v, h5py.Dataset):
+                    data[k] = MatVariable(self, v.name, v.shape, v.dtype)
+            return data
+        return _load_group(self.h5)
+
+    def close(self):
+        self.cache.clear()
+        if self.h5 is not None:
+            self.h5.close()
+            self.h5 = None
+
+def read_tree(d):
+    """read all the variables in the tree to memory"""
+    if isinstance(d, MatVariable):
+        return d.load()
+    if isinstance(d, MutableMapping):
+        return {k: read_tree(v) for k, v in d.items()}
+    return d
 
-    if isinstance(raw, h5py.File):
-        raw.close()
+def load_mat(filename):
+    mat = MatFile(filename)
+    return {'info': mat.info, 'data': mat.tree(), 'file': mat}
 
-    return data
 
+class MatTree(LazyTreeMixin, TreeCtrlNoTimeStamp):
+    lazy_types = (MatVariable,)
 
-class MatTree(TreeCtrlNoTimeStamp):
+    def read_item(self, d):
+        return d.load()
 
     def GetItemDataFromPath(self, path):
         d = super().GetItemDataFromPath(path)
-        if not self._is_folder(d):
-            d = np.array(d)
+        if not self._is_folder(d) and self._read_data:
+            # no copy, the data in tree is already an array
+            d = np.asarray(d)
         return d
 
+    def _has_pattern(self, d):
+        # not load the struct just for searching
+        if isinstance(d, MatStruct) and not d.loaded():
+            return False
+        return super()._has_pattern(d)
+
 
 class InfoListCtrl(ListCtrlBase):
 
@@ -115,9 +308,12 @@ class MatPanel(PanelNotebookBase):
         u = data
         if u is None:
             u = self.open(filename)
+        else:
+            retain(u)
+        self.close()
         self.mat = u
         if u:
-            self.tree.Load(u['data'], filename)
+            self.tree.Load(overlay(u['data']), filename)
             self.infoList.Load(u['info'])
         else:
             self.tree.Load(None)
@@ -126,6 +322,15 @@ class MatPanel(PanelNotebookBase):
 
         super().doLoad(filename, add_to_history=add_to_history, data=data)
 
+    def close(self):
+        if self.mat and not release(self.mat) and self.mat.get('file', None) is not None:
+            self.mat['file'].close()
+        self.mat = None
+
+    def Destroy(self):
+        self.close()
+        super().Destroy()
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -140,7 +345,7 @@ class MatPanel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return load_mat(filename)
+        return acquire(filename, load_mat, close=lambda mat: mat['file'].close())
 
 
 class Mat(FileViewBase):
@@ -169,15 +374,26 @@ class Mat(FileViewBase):
 
     @classmethod
     def get(cls, num=None, filename=None, data_only=True):
+        """
+        the data of the file, which is read to memory; so it is still
+        available after the panel or the file is closed
+        """
         manager = super().get(num, filename, data_only)
         mat = None
-        if manager:
-            mat = manager.mat
-        elif filename:
-            try:
-                mat = load_mat(filename)
-            except:
-                traceback.print_exc(file=sys.stdout)
+        try:
+            if manager:
+                u = manager.mat
+                if u:
+                    mat = {'info': u['info'], 'data': read_tree(u['data'])}
+            elif filename:
+                # not opened by any panel, read it and close the file
+                u = load_mat(filename)
+                try:
+                    mat = {'info': u['info'], 'data': read_tree(u['data'])}
+                finally:
+                    u['file'].close()
+        except:
+            traceback.print_exc(file=sys.stdout)
         return mat
 
 def bsm_initialize(frame, **kwargs):
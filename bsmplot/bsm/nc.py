@@ -1,6 +1,10 @@
 import os
 import sys
+import re
+import glob
 import traceback
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 import wx
 import wx.py.dispatcher as dp
 import numpy as np
@@ -10,33 +14,400 @@ from netCDF4 import Dataset
 from bsmutility.pymgr_helpers import Gcm
 from bsmutility.fileviewbase import TreeCtrlNoTimeStamp, ListCtrlBase, PanelNotebookBase, FileViewBase
 from bsmutility.autocomplete import AutocompleteTextCtrl
-from bsmutility.utility import get_tree_item_name
+from .filecache import acquire, retain, release, overlay
+from .lazytree import LazyMapping, LazyTreeMixin
+
+def parse_index(text):
+    """parse the index string (e.g., '[:, 10, 2:5]') to a tuple of int/slice"""
+    text = text.strip()
+    if text.startswith('[') and text.endswith(']'):
+        text = text[1:-1]
+    index = []
+    for p in text.split(','):
+        p = p.strip()
+        if p == '...':
+            index.append(Ellipsis)
+        elif ':' in p:
+            s = [int(v) if v.strip() else None for v in p.split(':')]
+            if len(s) > 3:
+                raise ValueError(f'Invalid slice: {p}')
+            index.append(slice(*s))
+        else:
+            index.append(int(p))
+    return tuple(index)
+
+# CF time units in nanoseconds
+CF_TIME_UNITS = {
+    'days': 86400*10**9, 'day': 86400*10**9, 'd': 86400*10**9,
+    'hours': 3600*10**9, 'hour': 3600*10**9, 'hrs': 3600*10**9, 'hr': 3600*10**9, 'h': 3600*10**9,
+    'minutes': 60*10**9, 'minute': 60*10**9, 'mins': 60*10**9, 'min': 60*10**9,
+    'seconds': 10**9, 'second': 10**9, 'secs': 10**9, 'sec': 10**9, 's': 10**9,
+    'milliseconds': 10**6, 'millisecond': 10**6, 'msecs': 10**6, 'msec': 10**6, 'ms': 10**6,
+    'microseconds': 10**3, 'microsecond': 10**3, 'usecs': 10**3, 'usec': 10**3, 'us': 10**3,
+}
+
+def is_cf_time(units):
+    return isinstance(units, str) and re.match(r'\s*\w+\s+since\s+', units) is not None
+
+def _add_offset(ref, values, scale, unit='ns'):
+    # ref + values*scale (in unit), the invalid values are NaT
+    if np.issubdtype(values.dtype, np.integer):
+        return ref + (values.astype(np.int64) * scale).astype(f'timedelta64[{unit}]')
+    valid = np.isfinite(values)
+    offset = np.where(valid, np.round(values * scale), 0).astype(np.int64)
+    t = ref + offset.astype(f'timedelta64[{unit}]')
+    t[~valid] = np.datetime64('NaT')
+    return t
+
+def _to_datetime64(t):
+    # cftime datetime to datetime64, the day not in the month (e.g., Feb 30 in
+    # 360_day calendar) rolls over to the next month
+    return np.datetime64(f'{t.year:04d}-{t.month:02d}', 'M').astype('datetime64[us]') + \
+           np.timedelta64(t.day - 1, 'D') + np.timedelta64(t.hour, 'h') + \
+           np.timedelta64(t.minute, 'm') + np.timedelta64(t.second, 's') + \
+           np.timedelta64(t.microsecond, 'us')
+
+def decode_cf_time(values, units, calendar='standard'):
+    """
+    decode the CF time (e.g., 'seconds since 1970-01-01') to datetime64
+
+    The standard calendars are decoded with vectorized arithmetic; others
+    fall back to netCDF4.num2date. The calendars without the real-world
+    dates (e.g., noleap, 360_day) are approximated by the elapsed time since
+    the reference date. Return None if it can't be decoded.
+    """
+    m = re.match(r'\s*(\w+)\s+since\s+(.+)', units)
+    if m is None:
+        return None
+    unit, ref = m.group(1).lower(), m.group(2).strip()
+    calendar = (calendar or 'standard').lower()
+    values = np.asarray(values)
+    try:
+        ref = pd.Timestamp(ref)
+        if ref.tzinfo is not None:
+            ref = ref.tz_convert('UTC').tz_localize(None)
+        # the standard calendar is julian before 1582-10-15
+        if unit in CF_TIME_UNITS and (calendar == 'proleptic_gregorian' or \
+           (calendar in ['standard', 'gregorian'] and ref >= pd.Timestamp('1582-10-15'))):
+            ref = np.datetime64(ref.as_unit('ns').value, 'ns')
+            return _add_offset(ref, values, CF_TIME_UNITS[unit])
+    except (ValueError, OverflowError):
+        # e.g., the time is out of the range of datetime64[ns]
+        pass
+    try:
+        t = netCDF4.num2date(values, units, calendar, only_use_cftime_datetimes=False,
+                             only_use_python_datetimes=True)
+        return np.asarray(t, dtype='datetime64[us]')
+    except:
+        pass
+    try:
+        # e.g., noleap or 360_day calendar, whose dates can't be converted to
+        # datetime; the elapsed time keeps the axis monotonic
+        ref = _to_datetime64(netCDF4.num2date(0, units, calendar,
+                                              only_use_cftime_datetimes=True))
+        if unit in CF_TIME_UNITS:
+            return _add_offset(ref, values, CF_TIME_UNITS[unit] // 1000, 'us')
+        # e.g., 'months since', convert the dates one by one
+        t = netCDF4.num2date(values, units, calendar, only_use_cftime_datetimes=True)
+        t = np.ma.filled(np.ma.asarray(t, dtype=object), None)
+        return np.array([np.datetime64('NaT') if v is None else _to_datetime64(v)
+                         for v in t.ravel()], dtype='datetime64[us]').reshape(t.shape)
+    except:
+        return None
+
+class NCVariable:
+    """a variable in netCDF file, which is only read when accessed"""
+
+    def __init__(self, var):
+        self.var = var
+        # same as np.asarray(v[:]), but without the masked array overhead
+        self.var.set_auto_mask(False)
+        self._time = None
+
+    def is_time(self):
+        return is_cf_time(getattr(self.var, 'units', None))
+
+    def time(self):
+        """the decoded time (datetime64) of the CF time variable"""
+        if self._time is None and self.is_time():
+            self._time = decode_cf_time(self.read(), self.var.units,
+                                        getattr(self.var, 'calendar', 'standard'))
+        return self._time
+
+    @property
+    def shape(self):
+        return self.var.shape
+
+    @property
+    def dtype(self):
+        return self.var.dtype
+
+    @property
+    def ndim(self):
+        return self.var.ndim
+
+    @property
+    def dimensions(self):
+        return self.var.dimensions
+
+    @property
+    def attrs(self):
+        return {att: self.var.getncattr(att) for att in self.var.ncattrs()}
+
+    def read(self):
+        return np.asarray(self.var[:])
+
+    def __getitem__(self, key):
+        # only read the hyperslab from file
+        return np.asarray(self.var[key])
+
+    def __len__(self):
+        return len(self.var)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.read(), dtype=dtype)
+
+    def __repr__(self):
+        return f'<netCDF variable "{self.var.name}{self.dimensions}": shape {self.shape}>'
+
+class NCGroup(LazyMapping):
+    """a group in netCDF file, the children are listed from the metadata"""
+    leaf_types = (NCVariable,)
+
+    def __init__(self, group):
+        super().__init__()
+        self.group = group
+
+    @property
+    def attrs(self):
+        return {att: self.group.getncattr(att) for att in self.group.ncattrs()}
+
+    def _keys(self):
+        keys = list(self.group.variables.keys())
+        keys += [g for g in self.group.groups.keys() if g not in self.group.variables]
+        return keys
+
+    def _has(self, key):
+        return key in self.group.variables or key in self.group.groups
+
+    def _wrap(self, key):
+        if key in self.group.groups:
+            return NCGroup(self.group.groups[key])
+        return NCVariable(self.group.variables[key])
+
+    def __repr__(self):
+        return f'<netCDF group "{self.group.path}" ({len(self)} members)>'
+
+    def close(self):
+        self.group.close()
+
+def _scan_nc(filename, dim):
+    # the length, coordinate (and its units) and the decoded time (if the
+    # coordinate is CF time) of the record dimension in a file; the units may
+    # differ between files (e.g., 'seconds since <start of the file>'), so
+    # decode the time with the units and calendar of each file
+    with Dataset(filename) as nc:
+        num = len(nc.dimensions[dim])
+        coord = units = time = None
+        if dim in nc.variables:
+            v = nc.variables[dim]
+            v.set_auto_mask(False)
+            coord = np.asarray(v[:])
+            units = (getattr(v, 'units', None), getattr(v, 'calendar', 'standard'))
+            if is_cf_time(units[0]):
+                time = decode_cf_time(coord, *units)
+    return num, coord, units, time
+
+class NCMultiVariable(NCVariable):
+    """a variable aggregated along the record dimension of multiple files"""
+
+    def __init__(self, mf, var):
+        super().__init__(var)
+        self.mf = mf
+        self.path = var.group().path.rstrip('/') + '/' + var.name
+
+    @property
+    def shape(self):
+        return (int(self.mf.offsets[-1]),) + self.var.shape[1:]
+
+    def read(self):
+        return self[:]
+
+    def time(self):
+        """the decoded time, with the units and calendar of each file"""
+        if self._time is None and self.is_time():
+            if self.path == '/' + self.mf.dim:
+                self._time = self.mf.time
+            else:
+                times = []
+                for filename, _ in self.mf.iter_files(0, len(self)):
+                    with Dataset(filename) as nc:
+                        var = nc[self.path]
+                        var.set_auto_mask(False)
+                        t = decode_cf_time(np.asarray(var[:]), getattr(var, 'units', ''),
+                                           getattr(var, 'calendar', 'standard'))
+                    if t is None:
+                        return None
+                    times.append(t)
+                self._time = np.concatenate(times)
+        return self._time
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if key and key[0] is Ellipsis:
+            key = (slice(None),) + key
+        first, rest = (key[0], key[1:]) if key else (slice(None), ())
+        total = len(self)
+        if isinstance(first, slice):
+            start, stop, step = first.indices(total)
+        else:
+            first = int(first)
+            start = first + total if first < 0 else first
+            if not 0 <= start < total:
+                raise IndexError(f'index {first} is out of bounds')
+            stop, step = start + 1, 1
+        reverse = step < 0
+        if reverse:
+            # read in forward order, then reverse it
+            start, stop, step = start + (len(range(start, stop, step)) - 1)*step, start + 1, -step
+        data = []
+        # only read the files overlapping with [start, stop)
+        for filename, (f0, f1) in self.mf.iter_files(start, stop):
+            # the first index in file aligned with step
+            i0 = max(start, f0)
+            i0 += (start - i0) % step
+            if i0 >= min(stop, f1):
+                continue
+            with Dataset(filename) as nc:
+                var = nc[self.path]
+                var.set_auto_mask(False)
+                data.append(np.asarray(var[(slice(i0 - f0, min(stop, f1) - f0, step),) + rest]))
+        if data:
+            data = np.concatenate(data, axis=0)
+        else:
+            data = np.empty((0,) + self.var.shape[1:], dtype=self.dtype)[(slice(None),) + rest]
+        if reverse:
+            data = data[::-1]
+        if not isinstance(first, slice):
+            data = data[0]
+        return data
+
+    def sel(self, start=None, stop=None):
+        """
+        read the records with coordinate in [start, stop], which can also be
+        the datetime (e.g., '2024-01-01 10:00') if the coordinate is CF time
+        """
+        i0, i1 = self.mf.index(start, stop)
+        coord = self.mf.time if self.mf.time is not None else self.mf.coord
+        return coord[i0:i1], self[i0:i1]
+
+    def __repr__(self):
+        return f'<netCDF variable "{self.var.name}{self.dimensions}": shape {self.shape}, {len(self.mf.files)} files>'
+
+class NCMultiFile:
+    """
+    Aggregate the netCDF files (e.g., one file per hour) along the record
+    (e.g., time) dimension.
+
+    The record coordinate of each file is indexed once (in a process pool);
+    the aggregated variables only read the files overlapping with the
+    requested range.
+    """
+    # min number of files to scan in a process pool
+    min_parallel_scan = 8
+
+    def __init__(self, files, dim=None, max_workers=None):
+        if isinstance(files, str):
+            files = sorted(glob.glob(files))
+        if not files:
+            raise ValueError('No file to aggregate!')
+        # the first file is kept open as the template of the metadata
+        self.nc = Dataset(files[0])
+        if dim is None:
+            unlimited = [d for d, v in self.nc.dimensions.items() if v.isunlimited()]
+            dim = unlimited[0] if unlimited else 'time'
+        if dim not in self.nc.dimensions:
+            self.nc.close()
+            raise ValueError(f'Invalid record dimension: {dim}')
+        self.dim = dim
+
+        if len(files) >= self.min_parallel_scan:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                scan = list(executor.map(_scan_nc, files, repeat(dim)))
+        else:
+            scan = [_scan_nc(f, dim) for f in files]
+        nums, coords, units, times = zip(*scan)
+        # the raw coordinates are only comparable if the units are same
+        same_units = len(set(units)) == 1
+        key = None
+        if all(t is not None and len(t) > 0 for t in times):
+            key = [t[0] for t in times]
+        elif same_units and all(c is not None and len(c) > 0 for c in coords):
+            key = [c[0] for c in coords]
+        if key is not None:
+            # sort the files by the coordinate
+            order = sorted(range(len(files)), key=lambda i: key[i])
+            files = [files[i] for i in order]
+            nums, coords, times = [[x[i] for i in order] for x in (nums, coords, times)]
+        self.files = files
+        self.offsets = np.concatenate([[0], np.cumsum(nums)]).astype(np.int64)
+        self.coord = None
+        if same_units and all(c is not None for c in coords):
+            self.coord = np.concatenate(coords)
+        # decoded coordinate, if it is CF time
+        self.time = None
+        if all(t is not None for t in times):
+            self.time = np.concatenate(times)
+
+    def iter_files(self, start, stop):
+        # the files (and its record range) overlapping with [start, stop)
+        k0 = max(np.searchsorted(self.offsets, start, 'right') - 1, 0)
+        k1 = np.searchsorted(self.offsets, stop, 'left')
+        for k in range(k0, min(k1, len(self.files))):
+            yield self.files[k], (int(self.offsets[k]), int(self.offsets[k+1]))
+
+    def index(self, start=None, stop=None):
+        # the record range with coordinate in [start, stop]
+        coord = self.coord
+        if isinstance(start, str) or isinstance(stop, str) or \
+           np.issubdtype(np.asarray(start if start is not None else stop).dtype, np.datetime64):
+            # the range is datetime, e.g., '2024-01-01 10:00'
+            if self.time is None:
+                raise ValueError(f'The coordinate of dimension "{self.dim}" is not CF time!')
+            coord = self.time
+            start = None if start is None else np.datetime64(start)
+            stop = None if stop is None else np.datetime64(stop)
+        elif coord is None:
+            raise ValueError(f'No coordinate variable (with same units in all files) '
+                             f'for dimension "{self.dim}"!')
+        i0 = 0 if start is None else np.searchsorted(coord, start, 'left')
+        i1 = len(coord) if stop is None else np.searchsorted(coord, stop, 'right')
+        return int(i0), int(i1)
+
+    def tree(self):
+        # the tree from the first file, with the record variables aggregated
+        def _fill(group, ncgroup):
+            for k, v in ncgroup.variables.items():
+                if v.dimensions and v.dimensions[0] == self.dim:
+                    group._children[k] = NCMultiVariable(self, v)
+            for k, g in ncgroup.groups.items():
+                if k not in ncgroup.variables:
+                    _fill(group[k], g)
+            return group
+        return _fill(NCGroup(self.nc), self.nc)
 
 def load_nc(filename):
-    data = {}
-    attrs = {}
+    if glob.has_magic(filename):
+        # aggregate the files matching the pattern
+        return {'nc': NCMultiFile(filename).tree()}
+    # only the metadata is loaded, the variable is read when accessed; so keep
+    # the file open
     nc = Dataset(filename)
-    def _get_attr(v):
-        attrs = {}
-        for att in v.ncattrs():
-            attrs[att] = v.getncattr(att)
-        return attrs
-
-    def _load_group(group):
-        data = {}
-        attrs = {}
-        for k, v in group.variables.items():
-            data[k] = np.asarray(v[:])
-            attrs[k] = _get_attr(v)
-
-        attrs['.'] = _get_attr(group)
-
-        for g, v in group.groups.items():
-            data[g], attrs[g] = _load_group(v)
-        return data, attrs
-    data, attrs = _load_group(nc)
-    nc.close()
-    return {'nc': data}, {'nc': attrs}
+    return {'nc': NCGroup(nc)}
 
 class InfoListCtrl(ListCtrlBase):
 
@@ -100,54 +471,103 @@ class AttrsDialog(wx.Dialog):
         pattern = self.search.GetValue()
         self.infoList.Fill(pattern)
 
-class NCTree(TreeCtrlNoTimeStamp):
+class NCTree(LazyTreeMixin, TreeCtrlNoTimeStamp):
     ID_SHOW_ATTRIBUTES = wx.NewIdRef()
-
-    def __init__(self, parent, style=wx.TR_DEFAULT_STYLE):
-        super().__init__(parent, style)
-        self.attrs = {}
-
-    def GetItemDataFromPath(self, path):
-        d = super().GetItemDataFromPath(path)
-        if not self._is_folder(d):
-            d = np.array(d)
-        return d
+    ID_PLOT_SLICE = wx.NewIdRef()
+    lazy_types = (NCVariable,)
 
     def get_children(self, item):
         children = super().get_children(item)
         children = [c for c in children if c['label'] != 'ncattrs']
         return children
 
-    def Load(self, data, filename=None):
-        # data: [data, attrs]
-        self.attrs = data[1]
-        super().Load(data[0], filename)
-
     def GetItemAttrs(self, item):
         if item == self.GetRootItem():
             return []
 
         path = self.GetItemPath(item)
-        attrs = self.GetItemAttrsFromPath(path)
-        if self.ItemHasChildren(item):
-            return attrs.get('.', [])
-        return attrs
+        return self.GetItemAttrsFromPath(path) or []
 
     def GetItemAttrsFromPath(self, path):
         # path is an array, e.g., path = get_tree_item_path(name)
-        d = self.attrs
-        for i, p in enumerate(path):
-            if p not in d:
-                if isinstance(d, pd.DataFrame):
-                    # the name in node DataFrame is not parsed, so try the
-                    # combined name, e.g., if the column name is a[5],
-                    # get_tree_item_path will return ['a', '[5]']
-                    name = get_tree_item_name(path[i:])
-                    if name in d:
-                        return d[name]
+        # the attributes are read from file when requested
+        d = self.GetItemLazyDataFromPath(path)
+        if isinstance(d, (NCGroup, NCVariable)):
+            return d.attrs
+        return None
+
+    def GetItemTimeAxis(self, path, dim=0, index=None):
+        """
+        the decoded CF time of the x-axis data, or the coordinate variable of
+        dimension dim of the variable at path; None if it is not CF time.
+        """
+        if self.x_path is not None and self.x_path != path:
+            t = self.GetItemLazyDataFromPath(self.x_path)
+        else:
+            v = self.GetItemLazyDataFromPath(path)
+            if not isinstance(v, NCVariable) or v.ndim <= dim:
                 return None
-            d = d[p]
-        return d
+            name = v.dimensions[dim]
+            # the coordinate variable in the same group or its ancestors
+            t = None
+            for i in range(len(path) - 1, 0, -1):
+                g = self.GetItemLazyDataFromPath(path[:i])
+                if isinstance(g, NCGroup) and name in g.group.variables:
+                    t = g[name]
+                    break
+        if not isinstance(t, NCVariable) or not t.is_time():
+            return None
+        t = t.time()
+        if t is not None and index is not None:
+            t = t[index]
+        return t
+
+    def GetItemPlotData(self, item):
+        x, y = super().GetItemPlotData(item)
+        if y is not None and np.ndim(y) >= 1:
+            t = self.GetItemTimeAxis(self.GetItemPath(item))
+            if t is not None and len(t) == len(y):
+                x = t
+        return x, y
+
+    def PlotItem(self, item, confirm=True):
+        if not self.ItemHasChildren(item):
+            v = self.GetItemLazyDataFromPath(self.GetItemPath(item))
+            if isinstance(v, NCVariable) and v.ndim > 2:
+                # not read the whole variable, ask for the hyperslab
+                return self.PlotItemSlice(item)
+        return super().PlotItem(item, confirm=confirm)
+
+    def PlotItemSlice(self, item):
+        path = self.GetItemPath(item)
+        v = self.GetItemLazyDataFromPath(path)
+        # default: the 1st dimension at index 0 of the others
+        index = '[' + ', '.join([':'] + ['0']*(v.ndim-1)) + ']'
+        msg = f'Index of {path[-1]}{v.dimensions}, shape {v.shape}:'
+        parent = self.GetTopLevelParent()
+        dlg = wx.TextEntryDialog(self, msg, parent.GetLabel(), index)
+        if dlg.ShowModal() != wx.ID_OK:
+            return None
+        index = dlg.GetValue()
+        try:
+            idx = parse_index(index)
+            y = v[idx]
+        except:
+            traceback.print_exc(file=sys.stdout)
+            return None
+        x = None
+        if self.HasXaxisData(item):
+            x = self.GetItemDataFromPath(self.x_path)
+        elif np.ndim(y) == 1 and Ellipsis not in idx:
+            # the decoded time of the dimension not indexed by an integer
+            dims = [i for i, k in enumerate(idx) if isinstance(k, slice)]
+            dims += list(range(len(idx), v.ndim))
+            if len(dims) == 1:
+                k = idx[dims[0]] if dims[0] < len(idx) else slice(None)
+                x = self.GetItemTimeAxis(path, dims[0], k)
+        if x is None or np.ndim(y) != 1 or len(x) != len(y):
+            x = np.arange(0, np.size(y) if np.ndim(y) <= 1 else len(y))
+        return self.plot(x, y, "/".join(path) + index)
 
     def GetItemMenu(self, item):
         menu = super().GetItemMenu(item)
@@ -157,6 +577,10 @@ class NCTree(TreeCtrlNoTimeStamp):
         if data:
             menu.Insert(0, self.ID_SHOW_ATTRIBUTES, "Show attributes")
             menu.InsertSeparator(1)
+        if not self.ItemHasChildren(item):
+            v = self.GetItemLazyDataFromPath(self.GetItemPath(item))
+            if isinstance(v, NCVariable) and v.ndim > 1:
+                menu.Insert(0, self.ID_PLOT_SLICE, "Plot slice ...")
         return menu
 
     def doProcessCommand(self, cmd, item):
@@ -164,6 +588,8 @@ class NCTree(TreeCtrlNoTimeStamp):
             attr = self.GetItemAttrs(item)
             dlg = AttrsDialog(self, attr)
             dlg.ShowModal()
+        elif cmd == self.ID_PLOT_SLICE:
+            self.PlotItemSlice(item)
         else:
             super().doProcessCommand(cmd, item)
 
@@ -187,16 +613,30 @@ class NCPanel(PanelNotebookBase):
         """load the netCDF file"""
         u = data
         if u is None:
+            # close the file before opening it again
+            self.close()
             u = self.open(filename)
+        else:
+            retain(u)
+        self.close()
         self.nc = u
         if u:
-            self.tree.Load(u, filename)
+            self.tree.Load(overlay(u), filename)
         else:
             self.tree.Load(None)
             add_to_history = False
 
         super().doLoad(filename, add_to_history=add_to_history, data=data)
 
+    def close(self):
+        if self.nc and not release(self.nc):
+            self.nc['nc'].close()
+        self.nc = None
+
+    def Destroy(self):
+        self.close()
+        super().Destroy()
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -211,7 +651,7 @@ class NCPanel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return load_nc(filename)
+        return acquire(filename, load_nc, close=lambda nc: nc['nc'].close())
 
 class NC(FileViewBase):
     name = 'netCDF'
@@ -219,7 +659,11 @@ class NC(FileViewBase):
 
     @classmethod
     def check_filename(cls, filename):
-        if not super().check_filename(filename):
+        if isinstance(filename, str) and glob.has_magic(filename):
+            # pattern (e.g., 'data/*.nc') to aggregate multiple files
+            if not glob.glob(filename):
+                return False
+        elif not super().check_filename(filename):
             return False
 
         if filename is None:
@@ -239,15 +683,26 @@ class NC(FileViewBase):
 
     @classmethod
     def get(cls, num=None, filename=None, data_only=True):
+        """
+        the data of the file, which is read to memory; so it is still
+        available after the panel or the file is closed
+        """
         manager = super().get(num, filename, data_only)
         nc = None
-        if manager:
-            nc = manager.nc
-        elif filename:
-            try:
-                nc = load_nc(filename)
-            except:
-                traceback.print_exc(file=sys.stdout)
+        try:
+            if manager:
+                u = manager.nc
+                if u:
+                    nc = {'nc': u['nc'].read()}
+            elif filename:
+                # not opened by any panel, read it and close the file
+                u = load_nc(filename)
+                try:
+                    nc = {'nc': u['nc'].read()}
+                finally:
+                    u['nc'].close()
+        except:
+            traceback.print_exc(file=sys.stdout)
         return nc
 
 def bsm_initialize(frame, **kwargs):
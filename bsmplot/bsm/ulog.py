@@ -9,6 +9,7 @@ import pandas as pd
 from bsmutility.pymgr_helpers import Gcm
 from bsmutility.fileviewbase import ListCtrlBase, TreeCtrlWithTimeStamp, PanelNotebookBase, FileViewBase
 from bsmutility.utility import build_tree
+from .filecache import cached_load, acquire, retain, release, overlay
 
 def load_ulog(filename):
     ulg = pyulog.ULog(filename)
@@ -222,9 +223,13 @@ class ULogPanel(PanelNotebookBase):
         u = data
         if u is None:
             u = self.open(filename)
+        else:
+            retain(u)
+        # release the previous file
+        self.close()
         self.ulg = u
         if u:
-            self.tree.Load(u['data'], filename)
+            self.tree.Load(overlay(u['data']), filename)
             self.logList.Load(u['log'])
             self.infoList.Load(u['info'])
             self.paramList.Load(u['param'])
@@ -239,6 +244,15 @@ class ULogPanel(PanelNotebookBase):
 
         super().doLoad(filename, add_to_history=add_to_history, data=data)
 
+    def close(self):
+        if self.ulg:
+            release(self.ulg)
+        self.ulg = None
+
+    def Destroy(self):
+        self.close()
+        super().Destroy()
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -266,7 +280,7 @@ class ULogPanel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return load_ulog(filename)
+        return acquire(filename, load_ulog, cache=True)
 
 
 class ULog(FileViewBase):
@@ -300,7 +314,7 @@ class ULog(FileViewBase):
             ulg = manager.ulg
         elif filename:
             try:
-                ulg = load_ulog(filename)
+                ulg = cached_load(filename, load_ulog)
             except:
                 traceback.print_exc(file=sys.stdout)
         if ulg:
@@ -13,6 +13,7 @@ from bsmutility.utility import _dict, get_variable_name, send_data_to_shell
 from bsmutility.utility import build_tree, get_tree_item_path
 from bsmutility.fileviewbase import ListCtrlBase, TreeCtrlWithTimeStamp, PanelNotebookBase, FileViewBase
 from ..pvcd.pvcd import load_vcd as load_vcd2
+from .filecache import cached_load, acquire, retain, release, overlay
 
 def load_vcd3(filename):
     vcd = load_vcd2(filename)
@@ -391,10 +392,14 @@ class VcdPanel(PanelNotebookBase):
         u = data
         if u is None:
             u = self.open(filename)
+        else:
+            retain(u)
+        # release the previous file
+        self.close()
         self.vcd = u
         self.filename = filename
         if u:
-            self.tree.Load(u['data'], filename)
+            self.tree.Load(overlay(u['data']), filename)
             self.infoList.Load(u['info'])
             self.commentList.Load(u['comment'])
         else:
@@ -406,6 +411,15 @@ class VcdPanel(PanelNotebookBase):
 
         super().doLoad(filename, add_to_history=add_to_history, data=data)
 
+    def close(self):
+        if self.vcd:
+            release(self.vcd)
+        self.vcd = None
+
+    def Destroy(self):
+        self.close()
+        super().Destroy()
+
     def OnDoSearch(self, evt):
         pattern = self.search.GetValue()
         self.tree.Fill(pattern)
@@ -425,7 +439,7 @@ class VcdPanel(PanelNotebookBase):
 
     @classmethod
     def do_open(cls, filename):
-        return load_vcd3(filename)
+        return acquire(filename, load_vcd3, cache=True)
 
 
 class VCD(FileViewBase):
@@ -465,7 +479,7 @@ class VCD(FileViewBase):
             vcd = manager.vcd
         elif filename:
             try:
-                vcd = load_vcd3(filename)
+                vcd = cached_load(filename, load_vcd3)
             except:
                 traceback.print_exc(file=sys.stdout)
         if vcd:
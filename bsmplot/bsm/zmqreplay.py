@@ -0,0 +1,295 @@
+"""replay the recorded ZMQ session on a local PUB socket"""
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import functools
+import click
+import numpy as np
+import zmq
+
+@functools.lru_cache(maxsize=65536)
+def _split_key(key, separator='.'):
+    # e.g., 'a.b[1]' -> (['a'], 'b', 1)
+    parts = key.split(separator)
+    m = re.fullmatch(r'(.*)\[(\d+)\]', parts[-1])
+    if m:
+        return parts[:-1], m.group(1), int(m.group(2))
+    return parts[:-1], parts[-1], None
+
+def _unflatten(frame, separator='.'):
+    # the reverse of flatten, e.g., {'a.b': 1, 'c[0]': 2, 'c[1]': 3} ->
+    # {'a': {'b': 1}, 'c': [2, 3]}
+    data = {}
+    has_list = False
+    for key, value in frame.items():
+        parents, name, idx = _split_key(key, separator)
+        if not parents and idx is None:
+            data[name] = value
+            continue
+        d = data
+        for p in parents:
+            d = d.setdefault(p, {})
+            if not isinstance(d, dict):
+                break
+        else:
+            if idx is not None:
+                d.setdefault(name, {})[idx] = value
+                has_list = True
+            else:
+                d[name] = value
+            continue
+        # conflict (e.g., both 'a' and 'a.b'), keep the flattened key
+        data[key] = value
+    def _to_list(d):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                if v and all(isinstance(i, int) for i in v):
+                    # place the items by index, and the missing ones are None
+                    items = [None]*(max(v) + 1)
+                    for i, item in v.items():
+                        items[i] = item
+                    d[k] = items
+                else:
+                    _to_list(v)
+        return d
+    return _to_list(data) if has_list else data
+
+def write_json(filename, frames, separator='.'):
+    """
+    write the flattened frames, as (topic, frame), to the json-lines file;
+    the topic is saved as the reserved key '_topic', so the file can be read
+    by read_json.
+    """
+    with open(filename, 'w') as fp:
+        for topic, frame in frames:
+            try:
+                frame = _unflatten(frame, separator)
+                if topic:
+                    frame['_topic'] = topic
+                line = json.dumps(frame, default=_default)
+            except (TypeError, ValueError):
+                continue
+            fp.write(f'{line}\n')
+
+def read_json(filename, time_key='_time', interval=0.01):
+    """
+    iterate the frames in the json-lines file (e.g., exported from the ZMQ
+    panel), as (time, topic, frame); the time is from time_key, or spaced by
+    interval (in s) if not available.
+    """
+    with open(filename, 'r') as fp:
+        num = 0
+        for line in fp:
+            try:
+                frame = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(frame, dict):
+                continue
+            # the frame id, the receive time and the topic are added by the
+            # receiver
+            frame.pop('_frame_id', None)
+            topic = frame.pop('_topic', '')
+            t = frame.pop('_time', None)
+            if time_key != '_time':
+                t = frame.get(time_key, None)
+            if not isinstance(t, (int, float)):
+                t = num*interval
+            num += 1
+            yield t, topic, frame
+
+def _read_group(group, topic, block_size=4096):
+    # iterate the frames in the group recorded by ZMQRecorder
+    import h5py
+    datasets = {k: v for k, v in group.items() if isinstance(v, h5py.Dataset)}
+    if '_time' not in datasets:
+        return
+    num = len(datasets['_time'])
+    for start in range(0, num, block_size):
+        t = datasets['_time'][start:start+block_size].tolist()
+        block = {}
+        for k, ds in datasets.items():
+            if k == '_time':
+                continue
+            col = ds[start:start+block_size]
+            # the missing values (NaN or '') are None
+            if col.dtype.kind == 'O':
+                values = [v.decode('utf-8', 'replace') if isinstance(v, bytes) else v for v in col]
+                values = [v if v != '' else None for v in values]
+            elif col.dtype.kind == 'f':
+                missing = np.isnan(col).reshape(len(col), -1).all(axis=1)
+                values = list(col) if col.ndim > 1 else col.tolist()
+                for i in np.flatnonzero(missing):
+                    values[i] = None
+            else:
+                values = list(col) if col.ndim > 1 else col.tolist()
+            block[k] = values
+        for i, ti in enumerate(t):
+            frame = {k: v[i] for k, v in block.items() if v[i] is not None}
+            yield ti, topic, _unflatten(frame)
+
+def read_h5(filename):
+    """
+    iterate the frames in the HDF5 file recorded by the ZMQ panel, as
+    (time, topic, frame), and the frames of all topics are sorted by time.
+    """
+    import h5py
+    with h5py.File(filename, 'r') as h5:
+        groups = [('', h5)]
+        h5.visititems(lambda name, obj: groups.append((name, obj))
+                      if isinstance(obj, h5py.Group) else None)
+        yield from heapq.merge(*[_read_group(g, topic) for topic, g in groups],
+                               key=lambda f: f[0])
+
+def read_session(filename, **kwargs):
+    _, ext = os.path.splitext(filename)
+    if ext.lower() in ['.h5', '.hdf5']:
+        return read_h5(filename)
+    return read_json(filename, **kwargs)
+
+def _default(obj):
+    # convert the numpy object for json/msgpack
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'{type(obj)} is not serializable')
+
+def _to_json(data):
+    if isinstance(data, dict):
+        return {k: _to_json(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_to_json(v) for v in data]
+    if isinstance(data, np.ndarray):
+        return data.tolist()
+    if isinstance(data, np.generic):
+        return data.item()
+    return data
+
+def get_encoder(fmt):
+    """return the function to encode the frame to the list of zmq frames"""
+    if fmt == 'binary':
+        from .zmqs import encode_binary
+        return encode_binary
+    if fmt == 'bson':
+        import bson
+        return lambda d: [bson.dumps(_to_json(d))]
+    if fmt == 'cbor':
+        import cbor2
+        return lambda d: [cbor2.dumps(_to_json(d))]
+    if fmt == 'msgpack':
+        import msgpack
+        return lambda d: [msgpack.packb(d, default=_default)]
+    return lambda d: [json.dumps(d, default=_default).encode('utf-8')]
+
+def _wait_until(target):
+    # sleep for the most time, and busy wait for the last ms to be precise
+    while True:
+        remain = target - time.perf_counter()
+        if remain <= 0:
+            return
+        if remain > 0.002:
+            time.sleep(remain - 0.001)
+
+def replay(filename, address='tcp://*:2967', rate=1.0, fmt='json', topic=None,
+           repeat=1, wait=1.0, hwm=1000, verbose=True, **kwargs):
+    """
+    publish the recorded session (json-lines or HDF5 file recorded by the ZMQ
+    panel) on a PUB socket.
+
+    rate: 1 for real-time, N for N times faster, and 0 (or None) for as fast
+          as possible.
+    fmt: message format, e.g., 'json', 'binary', 'msgpack'.
+    topic: the topic to publish all the frames; otherwise, use the recorded
+           topic.
+    repeat: number of times to replay the session, 0 for forever.
+    wait: time (in s) to wait for the subscribers to connect.
+
+    return the stats, e.g., number of messages sent, and the achieved rate.
+    """
+    encode = get_encoder(fmt)
+    context = zmq.Context.instance()
+    socket = context.socket(zmq.PUB)
+    socket.sndhwm = hwm
+    socket.bind(address)
+    time.sleep(wait)
+
+    num = 0
+    late = 0.
+    start = time.perf_counter()
+    report = start
+    # the start time of the current pass, relative to the first pass
+    offset = 0.
+    try:
+        r = 0
+        while repeat <= 0 or r < repeat:
+            r += 1
+            first = last = None
+            count = 0
+            for t, tp, frame in read_session(filename, **kwargs):
+                if first is None:
+                    first = t
+                last = t
+                count += 1
+                if rate:
+                    target = start + (offset + t - first)/rate
+                    now = time.perf_counter()
+                    if target > now:
+                        _wait_until(target)
+                    else:
+                        late = max(late, now - target)
+                tp = tp if topic is None else topic
+                msg = encode(frame)
+                if tp:
+                    msg = [tp.encode('utf-8')] + msg
+                socket.send_multipart(msg, copy=False)
+                num += 1
+                now = time.perf_counter()
+                if verbose and now - report >= 1:
+                    print(f'{num} messages, {num/(now - start):.1f} msg/s')
+                    report = now
+            if first is None:
+                break
+            # the next pass starts one (average) interval after the last frame
+            offset += (last - first)*count/max(count - 1, 1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket.close(linger=1000)
+    elapsed = time.perf_counter() - start
+    stats = {'messages': num, 'elapsed': elapsed,
+             'rate': num/elapsed if elapsed > 0 else 0.,
+             'max_late': late}
+    if verbose:
+        print(f"sent {num} messages in {elapsed:.3f}s, {stats['rate']:.1f} msg/s, "
+              f"max late {late*1000:.3f}ms")
+    return stats
+
+@click.command()
+@click.argument('filename', type=click.Path(exists=True))
+@click.option('--address', '-a', default='tcp://*:2967', help="Address to bind, default 'tcp://*:2967'.")
+@click.option('--rate', '-r', default='1',
+              help="Replay rate, e.g., 1 for real-time, 10 for 10x, 'max' for as fast as possible.")
+@click.option('--format', '-f', 'fmt', default='json',
+              type=click.Choice(['json', 'binary', 'bson', 'cbor', 'msgpack']),
+              help="Message format, default 'json'.")
+@click.option('--topic', '-t', default=None, help="Topic to publish all the messages.")
+@click.option('--repeat', '-n', default=1, help="Number of times to replay, 0 for forever.")
+@click.option('--wait', '-w', default=1.0, help="Time (in s) to wait for the subscribers.")
+@click.option('--hwm', default=1000, help="High water mark of the PUB socket.")
+@click.option('--time-key', default='_time', help="Key of the time (in s) in the json-lines file.")
+@click.option('--interval', default=0.01, help="Time (in s) between the frames without time.")
+def main(filename, address, rate, fmt, topic, repeat, wait, hwm, time_key, interval):
+    """Replay the recorded session FILENAME (json-lines or HDF5) on a ZMQ PUB socket."""
+    rate = 0 if rate.lower() in ['max', 'inf', '0'] else float(rate)
+    kwargs = {}
+    _, ext = os.path.splitext(filename)
+    if ext.lower() not in ['.h5', '.hdf5']:
+        kwargs = {'time_key': time_key, 'interval': interval}
+    replay(filename, address, rate, fmt, topic, repeat, wait, hwm, **kwargs)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,11 +2,13 @@ import os
 import sys
 import re
 import json
+import time
+import heapq
 import traceback
 import datetime
 import multiprocessing as mp
+from multiprocessing import shared_memory
 from collections.abc import MutableMapping
-import collections
 import six.moves.queue as Queue
 import wx
 import wx.py.dispatcher as dp
@@ -16,7 +18,7 @@ import zmq
 import propgrid as pg
 from bsmutility.bsmxpm import open_svg, run_svg, run_grey_svg, pause_svg, pause_grey_svg, \
                               stop_svg, stop_grey_svg, more_svg, saveas_svg, download_svg, \
-                              upload_svg
+                              upload_svg, radio_checked_svg, radio_disabled_svg
 
 from bsmutility.utility import svg_to_bitmap
 from bsmutility.pymgr_helpers import Gcm
@@ -50,6 +52,592 @@ def flatten(dictionary, parent_key='', separator='.'):
                 items.append((new_key, value))
     return dict(items)
 
+def encode_binary(data, parent_key='', separator='.'):
+    """
+    encode the dict to the binary multipart message, i.e., a json header
+    followed by the raw buffer of each numeric array. The header is
+        {'data': {...}, 'arrays': [{'name': ..., 'dtype': ..., 'shape': ...}]}
+    where 'data' has all the items except the arrays, and the array name is
+    the flattened key.
+    """
+    header = {'data': {}, 'arrays': []}
+    buffers = []
+    def _encode(d, parent, out):
+        for key, value in d.items():
+            name = parent + separator + key if parent else key
+            if isinstance(value, MutableMapping):
+                out[key] = {}
+                _encode(value, name, out[key])
+                if not out[key]:
+                    out.pop(key)
+            elif isinstance(value, np.ndarray) and value.dtype.kind in 'biufc':
+                value = np.ascontiguousarray(value)
+                header['arrays'].append({'name': name,
+                                         'dtype': np.lib.format.dtype_to_descr(value.dtype),
+                                         'shape': value.shape})
+                buffers.append(memoryview(value).cast('B'))
+            else:
+                out[key] = value
+    _encode(data, parent_key, header['data'])
+    return [json.dumps(header).encode('utf-8')] + buffers
+
+def decode_binary(frames):
+    """
+    decode the binary multipart message (see encode_binary); the arrays are
+    read-only views of the received buffers, without copy. Note that they are
+    still copied (pickled) once when sent to the GUI process.
+    """
+    def _buffer(frame):
+        return frame.buffer if isinstance(frame, zmq.Frame) else frame
+    header = json.loads(bytes(_buffer(frames[0])))
+    arrays = header.get('arrays', [])
+    if len(arrays) != len(frames) - 1:
+        raise ValueError(f'{len(arrays)} arrays in header, but {len(frames)-1} buffers received')
+    data = header.get('data', {})
+    for a, frame in zip(arrays, frames[1:]):
+        dtype = np.lib.format.descr_to_dtype(a['dtype'])
+        data[a['name']] = np.frombuffer(_buffer(frame), dtype=dtype).reshape(a['shape'])
+    return data
+
+class Flattener:
+    """
+    Flatten the frames with the cached layout.
+
+    The frames from the same source usually have the same structure, so the
+    flattened keys are cached for each structure (signature). For the frame
+    with known structure, only its values are collected, without building the
+    keys. The result is same as flatten(), as (keys, values).
+    """
+    # max number of layouts cached
+    max_layouts = 1024
+
+    def __init__(self):
+        self.layouts = {}
+
+    def _walk(self, data, values, sig):
+        # collect the values and the signature of the structure; the dict is
+        # encoded as (keys, children..., None), so the signature is unique
+        sig.append(tuple(data))
+        for i, value in enumerate(data.values()):
+            t = type(value)
+            if t in (int, float, str, bool) or value is None:
+                # the most common case, skip the other checks
+                values.append(value)
+            elif isinstance(value, MutableMapping):
+                sig.append(i)
+                self._walk(value, values, sig)
+            elif isinstance(value, list):
+                if value and isinstance(value[0], (list, tuple)):
+                    # may be a numeric matrix
+                    try:
+                        v = np.asarray(value)
+                        if np.issubdtype(v.dtype, np.number) and v.ndim > 1:
+                            sig.append((i, -1))
+                            values.append(v)
+                            continue
+                    except:
+                        pass
+                sig.append((i, len(value)))
+                if len(value) == 1:
+                    values.append(value)
+                else:
+                    values.extend(value)
+            else:
+                values.append(value)
+        sig.append(None)
+
+    def __call__(self, data):
+        values = []
+        sig = []
+        self._walk(data, values, sig)
+        sig = tuple(sig)
+        keys = self.layouts.get(sig, None)
+        if keys is not None:
+            return keys, values
+        items = flatten(data)
+        keys = tuple(items)
+        if len(keys) != len(values):
+            # duplicated keys (e.g., {'a.b': 1, 'a': {'b': 2}}), not cached
+            return keys, list(items.values())
+        if len(self.layouts) >= self.max_layouts:
+            self.layouts.clear()
+        self.layouts[sig] = keys
+        return keys, values
+
+class ColumnBuffer:
+    """
+    Columnar ring buffer of the flattened frames.
+
+    Each key has its own preallocated ring buffer with maxlen rows. The
+    latest rows are returned as a view without copy, unless they wrap around
+    the end of the buffer, in which case the two parts are copied into one
+    array. The missing keys in a frame are filled with NaN.
+    """
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = max(int(maxlen), 1)
+        # number of frames appended
+        self.num = 0
+        self.columns = {}
+
+    def __len__(self):
+        return min(self.num, self.maxlen)
+
+    def keys(self):
+        return self.columns.keys()
+
+    def clear(self):
+        self.num = 0
+        self.columns = {}
+
+    def _view(self, col, start, end):
+        # the frames [start, end) (counted from the first frame appended) in
+        # col, which is copied only if it wraps around the end of the buffer
+        if start >= end:
+            return col[:0]
+        m = self.maxlen
+        i, j = start % m, (end - 1) % m + 1
+        if i < j:
+            return col[i:j]
+        return np.concatenate([col[i:], col[:j]])
+
+    def _new_column(self, value):
+        if isinstance(value, (bool, np.bool_, float, np.floating)) or value is None:
+            return np.full(self.maxlen, np.nan)
+        if isinstance(value, (int, np.integer)):
+            return np.zeros(self.maxlen, dtype=np.int64)
+        if isinstance(value, (list, np.ndarray)):
+            v = np.asarray(value)
+            if np.issubdtype(v.dtype, np.number) or v.dtype == bool:
+                return np.full((self.maxlen,) + v.shape, np.nan)
+        return np.full(self.maxlen, np.nan, dtype=object)
+
+    def _accept(self, col, value):
+        # check if value can be saved in col without losing information
+        if col.dtype.kind == 'O':
+            return True
+        if isinstance(value, (str, bytes, MutableMapping)):
+            return False
+        if col.dtype.kind == 'i':
+            return isinstance(value, (int, np.integer))
+        if col.ndim == 1:
+            return not isinstance(value, (list, np.ndarray))
+        return isinstance(value, (list, np.ndarray)) and np.shape(value) == col.shape[1:]
+
+    def _upgrade(self, key, value):
+        # int -> float -> object
+        col = self.columns[key]
+        if col.dtype.kind == 'i' and (value is None or isinstance(value, (float, np.floating))):
+            new = col.astype(float)
+        else:
+            new = np.full(len(col), np.nan, dtype=object)
+            for i, v in enumerate(col):
+                new[i] = v
+        self.columns[key] = new
+        return new
+
+    def append(self, frame):
+        i = self.num % self.maxlen
+        for k, v in frame.items():
+            col = self.columns.get(k, None)
+            if col is None:
+                col = self._new_column(v)
+                if col.dtype.kind == 'i' and self.num > 0:
+                    # the previous frames don't have this key
+                    col = col.astype(float)
+                    col[:] = np.nan
+                self.columns[k] = col
+            elif not self._accept(col, v):
+                col = self._upgrade(k, v)
+            try:
+                col[i] = v
+            except (TypeError, ValueError):
+                col = self._upgrade(k, v)
+                col[i] = v
+        if len(frame) < len(self.columns):
+            for k, col in self.columns.items():
+                if k not in frame:
+                    if col.dtype.kind == 'i':
+                        col = self._upgrade(k, None)
+                    col[i] = np.nan
+        self.num += 1
+
+    def _range(self, since=-1):
+        # the range of the frames with frame id larger than since
+        end = self.num
+        start = end - len(self)
+        if since is not None and since >= 0:
+            fid = self.columns.get('_frame_id', None)
+            if fid is not None and fid.dtype.kind == 'i':
+                # frame id is increasing; search the part before the end of
+                # the buffer first, then the wrapped part
+                head = fid[start % self.maxlen:start % self.maxlen + end - start]
+                k = int(np.searchsorted(head, since, 'right'))
+                if k == len(head):
+                    k += int(np.searchsorted(fid[:end - start - len(head)], since, 'right'))
+                start += k
+            else:
+                start = max(start, end - max(self.num - since, 0))
+        return start, end
+
+    def append_rows(self, values):
+        """append multiple frames, values is a dict of 1d arrays with same length"""
+        if not values:
+            return
+        k = len(next(iter(values.values())))
+        if k == 0:
+            return
+        m = self.maxlen
+        # the int column can only be created before the first frame
+        empty = self.num == 0
+        if k > m:
+            # only the latest m frames will be kept
+            values = {key: v[-m:] for key, v in values.items()}
+            self.num += k - m
+            k = m
+        idx = (self.num + np.arange(k)) % m
+        for key, v in values.items():
+            v = np.asarray(v)
+            col = self.columns.get(key, None)
+            if col is None:
+                if v.dtype.kind == 'i' and empty:
+                    col = np.zeros((m,) + v.shape[1:], dtype=np.int64)
+                else:
+                    col = np.full((m,) + v.shape[1:], np.nan)
+                self.columns[key] = col
+            elif not np.can_cast(v.dtype, col.dtype, 'same_kind') or col.shape[1:] != v.shape[1:]:
+                col = self._upgrade(key, None if v.dtype.kind == 'f' else v)
+            col[idx] = v
+        if len(values) < len(self.columns):
+            for key, col in self.columns.items():
+                if key not in values:
+                    if col.dtype.kind == 'i':
+                        col = self._upgrade(key, None)
+                    col[idx] = np.nan
+        self.num += k
+
+    def get(self, key, since=-1):
+        """
+        the column key, with frame id (column '_frame_id') larger than since;
+        it is a view of the buffer unless the frames wrap around its end
+        """
+        col = self.columns.get(key, None)
+        if col is None:
+            return None
+        start, end = self._range(since)
+        return self._view(col, start, end)
+
+    def frame_id(self, since=-1):
+        """the frame ids larger than since"""
+        fid = self.columns.get('_frame_id', None)
+        if fid is not None and fid.dtype.kind == 'i':
+            return self.get('_frame_id', since)
+        # frame id is not available (e.g., loaded from file), use the index
+        return self.index(since) + 1
+
+    def index(self, since=-1):
+        """the index (number of frames appended before) of the frames after since"""
+        start, end = self._range(since)
+        return np.arange(start, end)
+
+    def frames(self):
+        """iterate the buffered frames as dict, without the missing keys"""
+        data = {k: self.get(k) for k in self.columns}
+        for i in range(len(self)):
+            frame = {}
+            for k, col in data.items():
+                v = col[i]
+                if col.ndim > 1:
+                    v = v.tolist()
+                elif isinstance(v, (float, np.floating)) and np.isnan(v):
+                    continue
+                elif isinstance(v, np.generic):
+                    v = v.item()
+                frame[k] = v
+            yield frame
+
+    def resize(self, maxlen):
+        """change the buffer size, and keep the latest frames"""
+        maxlen = max(int(maxlen), 1)
+        if maxlen == self.maxlen:
+            return
+        n = min(len(self), maxlen)
+        columns = {}
+        for k in self.columns:
+            v = self.get(k)[len(self)-n:]
+            col = np.empty((maxlen,) + v.shape[1:], dtype=v.dtype)
+            col[:n] = v
+            columns[k] = col
+        self.columns = columns
+        self.maxlen = maxlen
+        self.num = n
+
+def _attach_shm(name):
+    # attach to the shared memory created by the other process
+    try:
+        # python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # the memory is owned by the writer, not unlink it when the reader exits
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class SharedRing:
+    """
+    Columnar ring buffer in shared memory, to transfer the numeric frames
+    from the subscriber process to the GUI without serialization.
+
+    The header is the number of rows written; then the sequence number of
+    each row (capacity), and the data as a float64 array (capacity x number
+    of columns). The writer marks the row (sequence -1) before writing it,
+    sets its sequence after, and then updates the header; the reader copies
+    the rows written since last read, and drops the rows whose sequence
+    doesn't match (i.e., overwritten or being written by the writer, if the
+    reader is lapped).
+    """
+    header_size = 64
+
+    def __init__(self, columns, capacity=65536, name=None):
+        self.columns = list(columns)
+        self.capacity = capacity
+        size = self.header_size + 8*capacity*(max(len(self.columns), 1) + 1)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach_shm(name)
+        self.count = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.seq = np.ndarray((capacity,), dtype=np.int64, buffer=self.shm.buf,
+                              offset=self.header_size)
+        self.data = np.ndarray((capacity, len(self.columns)), dtype=np.float64,
+                               buffer=self.shm.buf, offset=self.header_size + 8*capacity)
+        if name is None:
+            self.count[0] = 0
+            self.seq[:] = -1
+        # number of rows read
+        self.num = 0
+        # number of rows overwritten before being read
+        self.lost = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def schema(self):
+        return {'name': self.name, 'columns': self.columns, 'capacity': self.capacity}
+
+    @classmethod
+    def attach(cls, schema):
+        return cls(schema['columns'], schema['capacity'], name=schema['name'])
+
+    def write(self, row):
+        n = int(self.count[0])
+        i = n % self.capacity
+        self.seq[i] = -1
+        self.data[i] = row
+        self.seq[i] = n
+        self.count[0] = n + 1
+
+    def read(self):
+        """copy the rows written since last read"""
+        total = int(self.count[0])
+        start = max(self.num, total - self.capacity)
+        if total <= start:
+            return None
+        expected = np.arange(start, total)
+        idx = expected % self.capacity
+        rows = self.data[idx]
+        # check the sequence after the rows are copied, so the rows modified
+        # by the writer during copy are dropped
+        valid = self.seq[idx] == expected
+        self.lost += start - self.num + len(valid) - int(valid.sum())
+        self.num = total
+        if not valid.all():
+            rows = rows[valid]
+        return rows if len(rows) else None
+
+    def close(self, unlink=False):
+        self.count = None
+        self.seq = None
+        self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+class ZMQRecorder:
+    """
+    Record the flattened frames to a HDF5 file.
+
+    Each key is saved to a resizable, chunked dataset, and the frames of a
+    topic are saved in the group with the topic name. The receive time (in s
+    since epoch) of each frame is saved to dataset '_time'. The frames are
+    buffered and written in chunks, and the missing values are filled with
+    NaN (or 0/'' for int/string). Like ColumnBuffer, the int dataset is
+    upgraded to float, and the dataset with other type/shape is upgraded to
+    string (e.g., json).
+    """
+    # number of frames in each chunk
+    chunk_size = 1024
+    # max time (in s) to hold the frames before writing them to the file
+    flush_period = 1.0
+
+    def __init__(self, filename, source=None, fmt=None):
+        import h5py
+        self.h5py = h5py
+        self.filename = filename
+        self.h5 = h5py.File(filename, 'w')
+        self.h5.attrs['source'] = str(source or '')
+        self.h5.attrs['format'] = str(fmt or '')
+        # the buffered frames of each topic, i.e., [(time, keys, values), ...]
+        self.frames = {}
+        self.flush_time = time.perf_counter()
+        self.num = 0
+
+    def _group(self, topic):
+        if not topic:
+            return self.h5
+        return self.h5.require_group(topic)
+
+    @staticmethod
+    def _kind(value):
+        # the dataset kind of the value
+        if isinstance(value, (bool, np.bool_, float, np.floating)) or value is None:
+            return 'f'
+        if isinstance(value, (int, np.integer)):
+            return 'i'
+        if isinstance(value, (list, np.ndarray)):
+            v = np.asarray(value)
+            if v.dtype.kind in 'biuf':
+                return 'a'
+        return 'S'
+
+    @staticmethod
+    def _to_string(value):
+        if value is None:
+            return ''
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        if isinstance(value, (list, MutableMapping)):
+            try:
+                return json.dumps(value)
+            except TypeError:
+                pass
+        return str(value)
+
+    def _create(self, group, key, kind, value, num):
+        shape = ()
+        if kind == 'i':
+            dtype, fill = np.int64, 0
+        elif kind == 'f':
+            dtype, fill = np.float64, np.nan
+        elif kind == 'a':
+            shape = np.shape(value)
+            dtype, fill = np.float64, np.nan
+        else:
+            dtype, fill = self.h5py.string_dtype(), ''
+        return group.create_dataset(key, shape=(num,) + shape, maxshape=(None,) + shape,
+                                    chunks=(self.chunk_size,) + shape, dtype=dtype,
+                                    fillvalue=fill)
+
+    def _upgrade(self, group, key, kind):
+        # replace the dataset with the one of new kind
+        ds = group[key]
+        data = ds[...]
+        num = len(ds)
+        del group[key]
+        new = self._create(group, key, kind, None, num)
+        if kind == 'f':
+            new[...] = data.astype(float)
+        else:
+            new[...] = [self._to_string(v) for v in data]
+        return new
+
+    def _column(self, ds, values):
+        # convert the values to the dataset type, return None if not possible
+        k = len(values)
+        if ds.dtype.kind == 'O':
+            return [self._to_string(v) for v in values]
+        try:
+            if ds.ndim > 1:
+                col = np.full((k,) + ds.shape[1:], np.nan)
+                for i, v in enumerate(values):
+                    if v is not None:
+                        col[i] = v
+                return col
+            if ds.dtype.kind == 'i':
+                if any(not isinstance(v, (int, np.integer)) or isinstance(v, (bool, np.bool_))
+                       for v in values):
+                    return None
+                return np.array(values, dtype=np.int64)
+            if any(isinstance(v, (str, bytes, list, np.ndarray, MutableMapping)) for v in values):
+                return None
+            return np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            return None
+
+    def append(self, topic, keys, values):
+        self.frames.setdefault(topic, []).append((time.time(), keys, values))
+        self.num += 1
+        if self.num >= self.chunk_size or \
+           time.perf_counter() - self.flush_time >= self.flush_period:
+            self.flush()
+
+    def due(self):
+        # time (in s) to the next flush, or None if nothing to write
+        if not self.num:
+            return None
+        return max(self.flush_time + self.flush_period - time.perf_counter(), 0)
+
+    def _write(self, topic, frames):
+        group = self._group(topic)
+        k = len(frames)
+        num = len(group['_time']) if '_time' in group else 0
+        columns = {'_time': [f[0] for f in frames]}
+        for i, (_, keys, values) in enumerate(frames):
+            for key, v in zip(keys, values):
+                # '/' will create sub group
+                key = key.replace('/', '.') or '_'
+                if key not in columns:
+                    columns[key] = [None]*k
+                columns[key][i] = v
+        for key, values in columns.items():
+            if key not in group:
+                first = next((v for v in values if v is not None), None)
+                ds = self._create(group, key, self._kind(first), first, num)
+            else:
+                ds = group[key]
+            col = self._column(ds, values)
+            if col is None:
+                ds = self._upgrade(group, key, 'f' if ds.dtype.kind == 'i' else 'S')
+                col = self._column(ds, values)
+                if col is None:
+                    ds = self._upgrade(group, key, 'S')
+                    col = self._column(ds, values)
+            ds.resize(num + k, axis=0)
+            ds[num:] = col
+        for key, ds in list(group.items()):
+            if isinstance(ds, self.h5py.Dataset) and len(ds) < num + k:
+                # the key is not in these frames, fill with the fillvalue
+                if ds.dtype.kind == 'i':
+                    ds = self._upgrade(group, key, 'f')
+                ds.resize(num + k, axis=0)
+
+    def flush(self):
+        for topic, frames in self.frames.items():
+            if frames:
+                self._write(topic, frames)
+        self.frames = {}
+        self.num = 0
+        self.flush_time = time.perf_counter()
+        self.h5.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.h5.close()
+
 class ZMQLogger:
     def __init__(self, qresp):
         self.qresp = qresp
@@ -61,11 +649,40 @@ class ZMQLogger:
         pass
 
 class ZMQMessage:
-    def __init__(self, ipaddr, qcmd, qresp, fmt='json'):
+    # max number of messages sent to the GUI at a time
+    batch_size = 1000
+    # max time (in s) to hold a message before sending it to the GUI
+    batch_period = 0.02
+
+    # number of rows in the shared memory ring buffer
+    ring_capacity = 65536
+
+    def __init__(self, ipaddr, qcmd, qresp, fmt='json', transport='queue', topics=None):
         self.qcmd = qcmd
         self.qresp = qresp
+        # the messages not sent to the GUI yet
+        self.batch = []
+        self.batch_start = 0
+        # shared memory transport, the numeric frames are written to the ring
+        # buffer, and the others are still sent in batch; so the frames with
+        # different transports may not be in order
+        self.shared = transport == 'shared memory'
+        self.ring = None
+        # the rings created, which are unlinked when the GUI switches to the
+        # new one, or exits
+        self.rings = []
+        # the positions of the keys in the current ring for each layout
+        self.ring_index = {}
+        self.flatten = Flattener()
+        # record the frames to the HDF5 file
+        self.recorder = None
         self.context = zmq.Context()
         self.socket = self.context.socket(zmq.SUB)
+        # the topic prefixes to subscribe, so the other messages are filtered
+        # by zmq; if not empty, the message shall start with its topic
+        self.topics = [t.encode('utf-8') for t in (topics or []) if t]
+        for t in self.topics or [b'']:
+            self.socket.subscribe(t)
 
         self.fmt = fmt
         self.serialize_zmq = None
@@ -80,88 +697,267 @@ class ZMQMessage:
             elif fmt == 'msgpack':
                 import msgpack
                 self.serialize_zmq = msgpack.unpackb
+            elif fmt == 'binary':
+                # receive the frames without copy, and the arrays are decoded
+                # as the views of the frame buffers; they are only copied when
+                # the batch is sent to the GUI
+                self.receive_zmq = lambda flags: self.socket.recv_multipart(flags, copy=False)
+                self.serialize_zmq = decode_binary
             else:
                 self.receive_zmq = self.socket.recv_string
                 self.serialize_zmq = json.loads
+            if self.topics:
+                # the topic may be in a separate frame
+                copy = fmt != 'binary'
+                self.receive_zmq = lambda flags: self.socket.recv_multipart(flags, copy=copy)
         except:
             traceback.print_exc()
-        self.ipaddr = None
+        self.ipaddr = []
         self.connect(ipaddr)
         self.running = False
 
     def disconnect(self):
-        if self.ipaddr:
-            self.socket.disconnect(self.ipaddr)
-        self.ipaddr = None
+        for addr in self.ipaddr:
+            try:
+                self.socket.disconnect(addr)
+            except zmq.ZMQError:
+                pass
+        self.ipaddr = []
 
     def connect(self, ipaddr):
+        # ipaddr may have multiple endpoints separated by ',', and the
+        # messages from all of them are received by the same socket
         self.disconnect()
 
-        self.ipaddr = ipaddr
-        self.socket.connect(ipaddr)
-        self.socket.subscribe("")
-        for i in range(10):
-            # wait 200,s and try to get some data, so the client can populate
-            # the data tree
-            if self.receive(sleep_ms=200):
-                break
+        if isinstance(ipaddr, str):
+            ipaddr = ipaddr.split(',')
+        self.ipaddr = [addr.strip() for addr in ipaddr if addr.strip()]
+        for addr in self.ipaddr:
+            self.socket.connect(addr)
+        # wait (up to 2s) for some data, so the client can populate the data
+        # tree
+        if self.socket.poll(2000):
+            self.receive()
+        self.flush()
+
+    def flush(self):
+        # send the messages to the GUI in one batch, so they are pickled and
+        # transferred together
+        if self.batch:
+            self.qresp.put({'cmd': 'batch', 'value': self.batch})
+            self.batch = []
+            self.batch_start = time.perf_counter()
+
+    def write_ring(self, keys, values):
+        # write the flattened frame to the shared memory, return False if it
+        # is not numeric
+        if not all(isinstance(v, (int, float, bool)) or v is None for v in values):
+            return False
+        index = self.ring_index.get(keys, None)
+        if index is None:
+            if self.ring is None or any(k not in self.ring.columns for k in keys):
+                # new schema, and the GUI will switch to the new ring after
+                # reading all the rows in the current one
+                columns = list(self.ring.columns) if self.ring else []
+                columns += [k for k in keys if k not in columns]
+                self.ring = SharedRing(columns, self.ring_capacity)
+                self.rings.append(self.ring)
+                self.ring_index = {}
+                self.qresp.put({'cmd': 'ring', 'value': self.ring.schema()})
+            index = [self.ring.columns.index(k) for k in keys]
+            self.ring_index[keys] = index
+        row = np.full(len(self.ring.columns), np.nan)
+        row[index] = np.array(values, dtype=float)
+        self.ring.write(row)
+        return True
+
+    def unlink_rings(self, name):
+        # the GUI has switched to the ring (name), so unlink the ones before it
+        names = [r.name for r in self.rings]
+        if name not in names:
+            return
+        k = names.index(name)
+        for ring in self.rings[:k]:
+            ring.close(unlink=True)
+        self.rings = self.rings[k:]
+
+    def close_rings(self):
+        for ring in self.rings:
+            ring.close(unlink=True)
+        self.rings = []
+        self.ring = None
+        self.ring_index = {}
+
+    def record(self, topic, keys, values):
+        try:
+            self.recorder.append(topic, keys, values)
+        except:
+            traceback.print_exc(file=sys.stdout)
+            self.stop_record()
+            # notify the GUI that the recording is stopped
+            self.qresp.put({'cmd': 'record', 'value': False, 'arguments': {}})
 
-    def receive(self, sleep_ms=100):
+    def start_record(self, filename):
+        self.stop_record()
+        try:
+            self.recorder = ZMQRecorder(filename, ','.join(self.ipaddr), self.fmt)
+        except:
+            traceback.print_exc(file=sys.stdout)
+            self.recorder = None
+        return self.recorder is not None
+
+    def stop_record(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            try:
+                recorder.close()
+            except:
+                traceback.print_exc(file=sys.stdout)
+
+    def split_topic(self, frames):
+        # return the topic and the payload of the message
+        first = frames[0].bytes if isinstance(frames[0], zmq.Frame) else frames[0]
+        if len(frames) > 1 and (self.fmt != 'binary' or not first.startswith(b'{')):
+            # the topic frame, e.g., send_multipart([topic, payload])
+            topic = first
+            payload = frames[1:] if self.fmt == 'binary' else frames[1]
+        else:
+            # the topic is the prefix of the message, e.g., b'topic {...}'
+            topic = max((t for t in self.topics if first.startswith(t)), key=len, default=b'')
+            payload = frames
+            if self.fmt != 'binary':
+                payload = first[len(topic):]
+                if self.fmt == 'json':
+                    payload = payload.lstrip()
+        return topic.decode('utf-8', 'replace'), payload
+
+    def receive(self):
+        # receive a message, return False if no message is waiting
         try:
             s = self.receive_zmq(zmq.NOBLOCK)
-            if self.serialize_zmq is not None:
+        except zmq.Again:
+            return False
+        if self.serialize_zmq is not None:
+            try:
+                topic = ''
+                if self.topics:
+                    topic, s = self.split_topic(s)
                 data = self.serialize_zmq(s)
-                self.qresp.put({'cmd': 'data', 'value': data})
-            return True
-        except zmq.ZMQError:
-            wx.MilliSleep(sleep_ms)
-        except Queue.Full:
-            wx.MilliSleep(sleep_ms)
-        return False
+                if not isinstance(data, MutableMapping):
+                    # only the dict can be shown in the data tree
+                    return True
+                # flatten the frame here, so the GUI only needs to combine
+                # the values
+                keys, values = self.flatten(data)
+            except:
+                traceback.print_exc(file=sys.stdout)
+                return True
+            if self.recorder is not None:
+                self.record(topic, keys, values)
+            if self.shared and not topic and self.write_ring(keys, values):
+                return True
+            # the frames with same layout share the keys, which are pickled
+            # only once in a batch
+            self.batch.append((topic, keys, values))
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+        return True
+
+    def drain(self, max_num=10000):
+        # receive all the messages waiting (but not more than max_num, so the
+        # command will not be blocked)
+        for _ in range(max_num):
+            if not self.receive():
+                break
+        if time.perf_counter() - self.batch_start >= self.batch_period:
+            # send the pending messages if the last batch was sent long ago, so
+            # the first message of a burst is sent immediately
+            self.flush()
+
+    def process_command(self, cmd):
+        # return True to exit
+        command = cmd.get("cmd", '')
+        if not command:
+            return False
+        self.flush()
+        is_exit = False
+        value = True
+        if command == "pause":
+            self.running = False
+            if self.recorder is not None:
+                self.recorder.flush()
+        elif command == "start":
+            self.running = True
+        elif command == "stop":
+            self.running = False
+            self.stop_record()
+            self.disconnect()
+        elif command == "record":
+            filename = cmd.get('arguments', {}).get('filename', None)
+            if filename:
+                value = self.start_record(filename)
+            else:
+                self.stop_record()
+        elif command == "ring_ack":
+            self.unlink_rings(cmd.get('arguments', {}).get('name', None))
+        elif command == "connect":
+            self.disconnect()
+            ipaddr = cmd.get('ipaddr', '')
+            if ipaddr:
+                self.connect(ipaddr)
+        elif command == "exit":
+            self.disconnect()
+            self.running = False
+            self.stop_record()
+            self.close_rings()
+            is_exit = True
+        resp = cmd
+        resp['value'] = value
+        self.qresp.put(resp)
+        return is_exit
 
     def process(self):
+        # wait for the data and command together; on Windows, the pipe can't
+        # be polled by zmq, so check it periodically
+        poller = zmq.Poller()
+        cmd_fd = None
+        if os.name != 'nt':
+            cmd_fd = self.qcmd.fileno()
+            poller.register(cmd_fd, zmq.POLLIN)
         is_exit = False
         while not is_exit:
-            if self.socket.closed or self.running:
-                try:
-                    cmd = self.qcmd.get_nowait()
-                except Queue.Empty:
-                    cmd = {}
-            else:
-                cmd = self.qcmd.get()
-            command = cmd.get("cmd", '')
-            if command:
-                if command == "pause":
-                    self.running = False
-                elif command == "start":
-                    self.running = True
-                elif command == "stop":
-                    self.running = False
-                    self.disconnect()
-                elif command == "connect":
-                    self.disconnect()
-                    ipaddr = cmd.get('ipaddr', '')
-                    if ipaddr:
-                        self.connect(ipaddr)
-                elif command == "exit":
-                    self.disconnect()
-                    self.running = False
-                    is_exit = True
-                resp = cmd
-                resp['value'] = True
-                self.qresp.put(resp)
-                continue
-            if self.running:
-                self.receive()
-
-def zmq_process(ipaddr, qresp, qcmd, fmt, debug=False):
+            # only wake up for the data when running
+            poller.register(self.socket, zmq.POLLIN if self.running else 0)
+            timeout = None if cmd_fd is not None else 50
+            if self.batch:
+                # wake up to send the pending messages
+                remain = self.batch_start + self.batch_period - time.perf_counter()
+                remain = max(int(remain*1000), 0)
+                timeout = remain if timeout is None else min(timeout, remain)
+            if self.recorder is not None and self.recorder.due() is not None:
+                # wake up to write the recorded frames
+                remain = int(self.recorder.due()*1000)
+                timeout = remain if timeout is None else min(timeout, remain)
+            events = dict(poller.poll(timeout))
+            while not is_exit and self.qcmd.poll():
+                is_exit = self.process_command(self.qcmd.recv())
+            if is_exit:
+                break
+            if self.running and events.get(self.socket, 0) & zmq.POLLIN:
+                self.drain()
+            elif self.batch and time.perf_counter() - self.batch_start >= self.batch_period:
+                self.flush()
+            if self.recorder is not None and self.recorder.due() == 0:
+                self.recorder.flush()
+
+def zmq_process(ipaddr, qresp, qcmd, fmt, debug=False, transport='queue', topics=None):
     if not debug:
         log = ZMQLogger(qresp)
         stdout = sys.stdout
         stderr = sys.stderr
         sys.stdout = log
         sys.stderr = log
-    proc = ZMQMessage(ipaddr, qcmd, qresp, fmt)
+    proc = ZMQMessage(ipaddr, qcmd, qresp, fmt, transport, topics)
     # infinite loop
     proc.process()
     if not debug:
@@ -172,17 +968,22 @@ class ZMQTree(TreeCtrlNoTimeStamp):
 
     def __init__(self, *args, **kwargs):
         TreeCtrlNoTimeStamp.__init__(self, *args, **kwargs)
-        self.df = collections.deque(maxlen=1000)
+        self.df = ColumnBuffer(maxlen=1000)
+        # the buffer of each topic, which is shown as a top level item
+        self.topics = {}
         self.num = 0
         dp.connect(self.RetrieveData, 'zmqs.retrieve')
         self.last_updated_time = datetime.datetime.now()
         self._graph_retrieved = True
         self._num_rx = 0
-        self.exclude_keys = ['_frame_id']
+        # the frame id, and the time (s since epoch) the frame is received
+        self.exclude_keys = ['_frame_id', '_time']
+        self.flatten = Flattener()
         # minimal time (in s) to update plot
         self._data_update_gap = self.LoadConfig('data_update_gap', 1)
 
     def RetrieveData(self, num, path, **kwargs):
+        # return the frames after last_frame_id, and the latest frame id
         self._graph_retrieved = True
         if num != self.num:
             return None, None, None
@@ -190,21 +991,35 @@ class ZMQTree(TreeCtrlNoTimeStamp):
         y = self._get_data_from_path(path, since=since)
         if y is None:
             return None, None, None
+        buf, _ = self._get_buffer(path)
         x = None
-        if self.x_path:
+        if self.x_path and self._get_buffer(self.x_path)[0] is buf:
             x = self._get_data_from_path(self.x_path, since=since)
         if x is None or len(x) != len(y):
-            x = np.arange(0, len(y))
-        return x, y, self._num_rx
-
-    def Load(self, data, filename=None):
+            # the sample index in the buffer
+            x = buf.index(since)
+            x = x[len(x)-len(y):]
+        # the frame id is only used to retrieve the new frames next time
+        fid = buf.frame_id(since)
+        last = int(fid[-1]) if len(fid) else max(since, 0)
+        return x, y, last
+
+    def Load(self, data, filename=None, topic=''):
         # flatten the tree, so make it easy to combine multiple frames together
         # e.g., frame 1: {'a': [1, 2, 3]}, frame 2 {'a': [1, 2, 3]}, after
         # combination, it shall become {'a[0]': [1, 1], 'a[1]': [2, 2], 'a[3]': [3, 3]}
         self.df.clear()
+        self.topics = {}
         data_f = {}
+        # the first frame of each topic in file
+        data_t = {}
         if data is not None:
             data_f = flatten(data)
+            if topic:
+                self.topics[topic] = ColumnBuffer(self.df.maxlen)
+                self.topics[topic].append(data_f)
+                super().Load({topic: build_tree(data_f)}, filename)
+                return
             self.df.append(data_f)
         elif isinstance(filename, str) and os.path.isfile(filename):
             with open(filename, "r") as ins:
@@ -213,31 +1028,77 @@ class ZMQTree(TreeCtrlNoTimeStamp):
                 self.SetQueueMaxLen(num_lines)
                 for line in ins:
                     try:
-                        self.df.append(flatten(json.loads(line)))
+                        frame = dict(zip(*self.flatten(json.loads(line))))
                     except:
                         continue
-            if len(self.df) > 0:
-                data_f = self.df[0]
-            else:
+                    # the topic is saved as the reserved key '_topic'
+                    topic = frame.pop('_topic', '')
+                    if topic:
+                        if topic not in self.topics:
+                            self.topics[topic] = ColumnBuffer(self.df.maxlen)
+                            data_t[topic] = build_tree(frame)
+                        self.topics[topic].append(frame)
+                        continue
+                    if not data_f:
+                        data_f = frame
+                    self.df.append(frame)
+            if not data_f and not data_t:
                 print(f"Invalid or empty data file: {filename}")
-        super().Load(build_tree(data_f), filename)
+        data = build_tree(data_f)
+        data.update(data_t)
+        super().Load(data, filename)
 
     def SetQueueMaxLen(self, maxlen):
-        if maxlen != self.df.maxlen:
-            df = collections.deque(maxlen=maxlen)
-            for d in self.df:
-                df.append(d)
-            self.df = df
+        self.df.resize(maxlen)
+        for buf in self.topics.values():
+            buf.resize(maxlen)
+
+    def _get_buffer(self, path):
+        # return the buffer of the path, and the path in the buffer
+        if self.topics and path and path[0] in self.topics:
+            return self.topics[path[0]], path[1:]
+        return self.df, path
+
+    def _append(self, topic, data, filename=None):
+        # append the flattened frame to the buffer of the topic, return False
+        # if the tree is (re)loaded
+        if not self.data:
+            self.Load(data, filename, topic=topic)
+            return False
+        if not topic:
+            self.df.append(data)
+            return True
+        buf = self.topics.get(topic, None)
+        if buf is None:
+            # new topic, add it to the tree
+            buf = ColumnBuffer(self.df.maxlen)
+            self.topics[topic] = buf
+            buf.append(data)
+            self.data[topic] = build_tree(data)
+            self.RefreshChildren(self.GetRootItem())
+            return True
+        buf.append(data)
+        return True
 
     def Update(self, data, filename=None):
-        if isinstance(data, MutableMapping):
+        self.UpdateBatch([data], filename)
+
+    def UpdateBatch(self, frames, filename=None):
+        frames = [('', *self.flatten(data)) for data in frames if isinstance(data, MutableMapping)]
+        self.UpdateFlat(frames, filename)
+
+    def UpdateFlat(self, frames, filename=None):
+        """append the flattened frames, i.e., [(topic, keys, values), ...]"""
+        appended = False
+        now = time.time()
+        for topic, keys, values in frames:
+            data = dict(zip(keys, values))
+            # frame id is increasing across all the topics
             self._num_rx += 1
             data['_frame_id'] = self._num_rx
-        if not self.data:
-            self.Load(data, filename)
-        else:
-            data_f = flatten(data)
-            self.df.append(data_f)
+            data['_time'] = now
+            appended = self._append(topic, data, filename) or appended
+        if appended:
             now = datetime.datetime.now()
             if self._graph_retrieved and (now - self.last_updated_time).total_seconds() >= self._data_update_gap:
                 # notify the graph
@@ -245,6 +1106,27 @@ class ZMQTree(TreeCtrlNoTimeStamp):
                 self.last_updated_time = now
                 wx.CallAfter(dp.send, 'graph.data_updated')
 
+    def UpdateRows(self, columns, rows, filename=None):
+        """append the numeric frames (rows) read from the shared memory"""
+        if rows is None or len(rows) == 0:
+            return
+        if not self.data:
+            self.UpdateFlat([('', columns, rows[0])], filename)
+            rows = rows[1:]
+            if len(rows) == 0:
+                return
+        values = {c: rows[:, i] for i, c in enumerate(columns)}
+        values['_frame_id'] = np.arange(self._num_rx + 1, self._num_rx + 1 + len(rows))
+        values['_time'] = np.full(len(rows), time.time())
+        self._num_rx += len(rows)
+        self.df.append_rows(values)
+        now = datetime.datetime.now()
+        if self._graph_retrieved and (now - self.last_updated_time).total_seconds() >= self._data_update_gap:
+            # notify the graph
+            self._graph_retrieved = False
+            self.last_updated_time = now
+            wx.CallAfter(dp.send, 'graph.data_updated')
+
     def GetItemKeyFromPath(self, path):
         # the path shall be joined with '.', and the only exception is array
         # item, e.g., ['a', '0'] -> 'a[0]'
@@ -277,33 +1159,71 @@ class ZMQTree(TreeCtrlNoTimeStamp):
             data = self.doConvertFromSetting(settings)
             if idx[0] > 1 and data is not None:
                 data = data[idx[1]]
+            if since >= 0 and data is not None:
+                # the converted data is from all the buffered frames
+                buf, _ = self._get_buffer(path)
+                data = data[len(data)-len(buf.frame_id(since)):]
             return data
 
+        buf, path = self._get_buffer(path)
+        if not path:
+            return None
         key = self.GetItemKeyFromPath(path)
-        data = [d[key] if key in d else np.nan for d in self.df if d['_frame_id'] > since]
-        data = np.array(data)
-        return None if pd.isna(data).all() else data
+        data = buf.get(key, since=since)
+        if data is None or (since < 0 and pd.isna(data).all()):
+            return None
+        return data
 
     def PlotItem(self, item, confirm=True):
         line = super().PlotItem(item, confirm=confirm)
         if line is not None:
             path = self.GetItemPath(item)
             line.trace_signal = {'signal': "zmqs.retrieve", 'num': self.num, 'path':path}
+            line.trace_maxlen = self._get_buffer(path)[0].maxlen
             line.autorelim = True
         self._graph_retrieved = True
 
-    def get(self, as_tree=True):
-        data = None
-        if len(self.df) == 0:
-            return data
-        keys = self.df[0].keys()
+    def _get_dataframe(self, buf):
+        if len(buf) == 0:
+            return None
         data = {}
-        for k in keys:
-            data[k] = np.array([d[k] if k in d else np.nan for d in self.df])
-        data = pd.DataFrame(data)
-        if as_tree:
+        for k in buf.keys():
+            v = buf.get(k)
+            # DataFrame column shall be 1d
+            data[k] = list(v) if v.ndim > 1 else v
+        return pd.DataFrame(data)
+
+    def get(self, as_tree=True):
+        """
+        return the buffered frames as DataFrame; if there are topics, return
+        a dict of DataFrame for each topic.
+        """
+        data = self._get_dataframe(self.df)
+        if as_tree and data is not None:
             data = build_tree(data)
-        return data
+        if not self.topics:
+            return data
+        topics = {}
+        if data is not None:
+            if as_tree:
+                topics.update(data)
+            else:
+                topics[''] = data
+        for topic, buf in self.topics.items():
+            d = self._get_dataframe(buf)
+            if d is not None:
+                topics[topic] = build_tree(d) if as_tree else d
+        return topics or None
+
+    def frames(self):
+        """iterate the buffered frames of all the topics in received order"""
+        buffers = [('', self.df)] + list(self.topics.items())
+        def _frames(topic, buf):
+            for frame in buf.frames():
+                yield frame.get('_frame_id', 0), topic, frame
+        for _, topic, frame in heapq.merge(*[_frames(t, b) for t, b in buffers],
+                                           key=lambda f: f[0]):
+            yield topic, frame
 
     def SetDataUpdateGap(self, gap, save_as_default=False):
         self._data_update_gap = gap
@@ -328,6 +1248,7 @@ class ZMQPanel(PanelNotebookBase):
     ID_EXPORT_JSON = wx.NewIdRef()
     ID_IMPORT_JSON = wx.NewIdRef()
     ID_SET_DATA_UPDATE_GAP = wx.NewIdRef()
+    ID_RECORD = wx.NewIdRef()
 
     def __init__(self, parent, filename=None):
         PanelNotebookBase.__init__(self, parent, filename=filename)
@@ -339,11 +1260,15 @@ class ZMQPanel(PanelNotebookBase):
         self.zmq = None
         self.qcmd = None
         self.qresp = None
+        # the shared memory ring buffer to read the numeric frames
+        self.ring = None
+        # the HDF5 file the subscriber is recording to
+        self.recording = None
         self.timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.OnTimer, self.timer)
         self.timer.Start(5)
         self.settings = {'protocol': 'tcp://', 'address': 'localhost', 'port': 2967,
-                         'format': 'json', 'maxlen': 1024}
+                         'format': 'json', 'maxlen': 1024, 'transport': 'queue', 'topics': ''}
         self.settings.update(self.LoadSettings())
 
         self.tree.num = self.num
@@ -365,6 +1290,9 @@ class ZMQPanel(PanelNotebookBase):
         self.tb.AddTool(self.ID_PAUSE, "Pause", svg_to_bitmap(pause_svg, win=self),
                         svg_to_bitmap(pause_grey_svg, win=self), wx.ITEM_NORMAL,
                         "Pause the ZMQ subscriber")
+        self.tb.AddTool(self.ID_RECORD, "Record", svg_to_bitmap(radio_checked_svg, win=self),
+                        svg_to_bitmap(radio_disabled_svg, win=self), wx.ITEM_CHECK,
+                        "Record the received data to HDF5 file")
         self.tb.AddSeparator()
         self.tb.AddTool(self.ID_IMPORT_JSON, "Import", svg_to_bitmap(upload_svg, win=self),
                         wx.NullBitmap, wx.ITEM_NORMAL,
@@ -397,17 +1325,31 @@ class ZMQPanel(PanelNotebookBase):
         self.timer.Stop()
         super().Destroy()
 
-    def process_response(self):
+    def process_response(self, budget=0.03):
+        # process all the responses waiting, but not longer than budget (in
+        # s), so the GUI is still responsive
         if not self.qresp:
             return None
-        try:
-            # process the response
-            resp = self.qresp.get_nowait()
+        rtn = None
+        self.read_ring()
+        start = time.perf_counter()
+        while time.perf_counter() - start < budget:
+            try:
+                resp = self.qresp.get_nowait()
+            except Queue.Empty:
+                break
             if resp:
-                return self._process_response(resp)
-        except Queue.Empty:
-            pass
-        return None
+                rtn = self._process_response(resp)
+        return rtn
+
+    def read_ring(self):
+        if self.ring is not None:
+            self.tree.UpdateRows(self.ring.columns, self.ring.read(), self.GetCaption())
+
+    def close_ring(self):
+        if self.ring is not None:
+            self.ring.close()
+        self.ring = None
 
     def _process_response(self, resp):
         command = resp.get('cmd', '')
@@ -416,9 +1358,26 @@ class ZMQPanel(PanelNotebookBase):
         value = resp.get('value', False)
         if command == 'data':
             self.tree.Update(value, self.GetCaption())
+        elif command == 'batch':
+            self.tree.UpdateFlat(value, self.GetCaption())
+        elif command == 'ring':
+            # read all the rows in the current ring before switching to the
+            # new one
+            self.read_ring()
+            self.close_ring()
+            try:
+                self.ring = SharedRing.attach(value)
+                # the previous rings can be unlinked now
+                self._send_command('ring_ack', block=False, name=self.ring.name)
+            except:
+                traceback.print_exc(file=sys.stdout)
+        elif command == 'record':
+            self.recording = resp.get('arguments', {}).get('filename', None) if value else None
         elif command in ['start', 'pause', 'stop']:
             if value:
                 self.zmq_status = command
+            if command == 'stop':
+                self.recording = None
             if command in ['pause', 'stop']:
                 # update the graph
                 dp.send('graph.data_updated')
@@ -447,7 +1406,7 @@ class ZMQPanel(PanelNotebookBase):
             if not kwargs.get('silent', True):
                 print(cmd, cid, kwargs)
 
-            self.qcmd.put({'id': cid, 'cmd': cmd, 'arguments': kwargs})
+            self.qcmd.send({'id': cid, 'cmd': cmd, 'arguments': kwargs})
             rtn = self.zmq.is_alive()
             self.timer.Stop()
             if block is True:
@@ -478,10 +1437,12 @@ class ZMQPanel(PanelNotebookBase):
         # looks like none-blocking command + zmp.join() may not work when close
         # the panel (some kind of deadlock)
         self._send_command('exit', block=True)
+        self.close_ring()
         #while not self.qresp.empty():
         #    self.qresp.get_nowait()
         #self.zmq.join()
         self.zmq = None
+        self.recording = None
         # stop the client
         self._process_response({'cmd': 'exit'})
 
@@ -491,17 +1452,40 @@ class ZMQPanel(PanelNotebookBase):
         filename = self.GetIPAddress()
         self.stop()
         self.qresp = mp.Queue(100)
-        self.qcmd = mp.Queue()
-        self.zmq = mp.Process(target=zmq_process, args=(filename, self.qresp, self.qcmd, self.settings['format'], True))
+        # the command is sent with pipe, so the subprocess can wait for the
+        # command and data together
+        qcmd, self.qcmd = mp.Pipe(duplex=False)
+        self.zmq = mp.Process(target=zmq_process, args=(filename, self.qresp, qcmd, self.settings['format'], True,
+                                                         self.settings.get('transport', 'queue'),
+                                                         self.GetTopics()))
         self.zmq.start()
+        # the reading end is owned by the subprocess
+        qcmd.close()
 
     def GetIPAddress(self):
+        # the address may have multiple endpoints separated by ',', e.g.,
+        # 'localhost, 192.168.1.2:2968, ipc:///tmp/data'; the protocol and
+        # port are added if not specified
         s = self.settings
         if 'protocol' in s and 'address' in s and 'port' in s:
-            filename = f"{s['protocol']}{s['address']}:{s['port']}"
-            return filename
+            endpoints = []
+            for addr in str(s['address']).split(','):
+                addr = addr.strip()
+                if not addr:
+                    continue
+                if '://' not in addr:
+                    if not re.search(r':\d+$', addr):
+                        addr = f"{addr}:{s['port']}"
+                    addr = f"{s['protocol']}{addr}"
+                endpoints.append(addr)
+            return ','.join(endpoints) or None
         return None
 
+    def GetTopics(self):
+        # the topic prefixes to subscribe, separated by ','
+        topics = self.settings.get('topics', '') or ''
+        return [t.strip() for t in topics.split(',') if t.strip()]
+
     def Load(self, filename, add_to_history=True):
         """start the ZMQ subscriber"""
         if isinstance(filename, str):
@@ -542,7 +1526,7 @@ class ZMQPanel(PanelNotebookBase):
 
     @classmethod
     def GetSettings(cls, parent, settings=None):
-        fmt = ['json']#, 'pyobj', 'bson', 'cbor', 'cdr', 'msgpack', 'protobuf', 'ros1']
+        fmt = ['json', 'binary']#, 'pyobj', 'bson', 'cbor', 'cdr', 'msgpack', 'protobuf', 'ros1']
         try:
             import bson
             fmt.append('bson')
@@ -562,8 +1546,11 @@ class ZMQPanel(PanelNotebookBase):
                    .Label('Protocol').Name('protocol').Value('tcp://'),
                  pg.PropText().Label('Address').Name('address').Value('localhost'),
                  pg.PropInt().Label('Port').Name('port').Value(2967),
+                 pg.PropText().Label('Topics').Name('topics').Value(''),
                  pg.PropChoice(fmt).Label('Message Format').Name('format').Value('json'),
-                 pg.PropInt().Label('Buffer Size').Name('maxlen').Value(1024)]
+                 pg.PropInt().Label('Buffer Size').Name('maxlen').Value(1024),
+                 pg.PropChoice(['queue', 'shared memory']).Label('Transport')
+                   .Name('transport').Value('queue')]
 
         dlg = PropSettingDlg(parent, props, config='zmqs.settings')
         if dlg.ShowModal() == wx.ID_OK:
@@ -587,6 +1574,17 @@ class ZMQPanel(PanelNotebookBase):
             self._send_command('pause', block=False)
         elif eid == self.ID_STOP:
             self._send_command('stop', block=False)
+        elif eid == self.ID_RECORD:
+            if self.recording:
+                self._send_command('record', filename=None)
+            else:
+                style = wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT | wx.FD_CHANGE_DIR
+                dlg = wx.FileDialog(self.GetTopLevelParent(),
+                                    'Record To',
+                                    wildcard="HDF5 files (*.h5;*.hdf5)|*.h5;*.hdf5|All files (*.*)|*.*",
+                                    style=style)
+                if dlg.ShowModal() == wx.ID_OK:
+                    self._send_command('record', filename=dlg.GetPath())
         elif eid == self.ID_IMPORT_JSON:
             style = wx.FD_OPEN | wx.FD_CHANGE_DIR
             dlg = wx.FileDialog(self.GetTopLevelParent(),
@@ -604,13 +1602,8 @@ class ZMQPanel(PanelNotebookBase):
                                 style=style)
             if dlg.ShowModal() == wx.ID_OK:
                 path = dlg.GetPath()
-                with open(path, 'w') as fp:
-                    for line in self.tree.df:
-                        try:
-                            line = json.dumps(build_tree(line))
-                        except:
-                            continue
-                        fp.write(f"{line}\n")
+                from .zmqreplay import write_json
+                write_json(path, self.tree.frames())
         elif eid == self.ID_EXPORT_CSV:
             style = wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT | wx.FD_CHANGE_DIR
             dlg = wx.FileDialog(self.GetTopLevelParent(),
@@ -620,7 +1613,13 @@ class ZMQPanel(PanelNotebookBase):
             if dlg.ShowModal() == wx.ID_OK:
                 path = dlg.GetPath()
                 df = self.tree.get(as_tree=False)
-                if df is not None:
+                if isinstance(df, dict):
+                    # one file for each topic
+                    root, ext = os.path.splitext(path)
+                    for topic, d in df.items():
+                        name = re.sub(r'[^\w\-.]', '_', topic)
+                        d.to_csv(f'{root}.{name}{ext}' if topic else path, index=False)
+                elif df is not None:
                     df.to_csv(path, index=False)
                 else:
                     print('Invalid data')
@@ -640,6 +1639,9 @@ class ZMQPanel(PanelNotebookBase):
             event.Enable(self.zmq is not None and self.zmq.is_alive() and self.zmq_status != 'start')
         elif eid == self.ID_PAUSE:
             event.Enable(self.zmq is not None and self.zmq.is_alive() and self.zmq_status == 'start')
+        elif eid == self.ID_RECORD:
+            event.Enable(self.zmq is not None and self.zmq.is_alive())
+            event.Check(bool(self.recording))
         else:
             super().OnUpdateCmdUI(event)
 
@@ -693,6 +1695,19 @@ class ZMQ(FileViewBase):
             return manager.tree.get(as_tree=True)
         return data
 
+    @classmethod
+    def replay(cls, filename, address='tcp://*:2967', rate=1.0, **kwargs):
+        """
+        replay the recorded session (json-lines or HDF5 file) on a PUB socket
+        in a background process, e.g., ZMQ.replay('session.h5', rate=10);
+        see zmqreplay.replay for the other arguments.
+        """
+        from .zmqreplay import replay
+        proc = mp.Process(target=replay, args=(filename, address, rate), kwargs=kwargs,
+                          daemon=True)
+        proc.start()
+        return proc
+
     @classmethod
     def get_menu(cls):
         return [['open', f'File:Open:{cls.name} subscriber']]
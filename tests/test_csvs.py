@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('wx')
+pytest.importorskip('bsmutility')
+from bsmplot.bsm.csvs import CsvFile, read_csv, read_tree
+
+
+@pytest.fixture
+def csv_file(tmp_path, monkeypatch):
+    # the values after the sample rows don't match the sampled dtype
+    monkeypatch.setattr(CsvFile, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(CsvFile, 'chunksize', 1000)
+    filename = tmp_path / 'a.csv'
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.write('a,b,c\n')
+        for i in range(3000):
+            b = '' if i == 2500 else str(i)
+            c = 'bad' if i == 2500 else f'{i}.5'
+            fp.write(f'{i*0.1},{b},{c}\n')
+    return str(filename)
+
+
+@pytest.mark.parametrize('float32', [False, True])
+def test_store_dtype_after_sample(csv_file, float32):
+    dtype = np.float32 if float32 else np.float64
+    # build the store, and open it again from the meta file
+    for _ in range(2):
+        csv = CsvFile(csv_file, float32=float32, memmap=True)
+        # int column with missing value
+        assert csv.dtypes[1] == dtype
+        assert csv.cache[1].dtype == dtype
+        assert np.isnan(csv.cache[1][2500])
+        assert csv.cache[1][2999] == 2999
+        # non-numeric column is parsed on demand
+        assert 2 not in csv.cache
+        assert csv.dtypes[2] == object
+        assert csv.get(2)[2500] == 'bad'
+
+
+def test_read_tree(csv_file):
+    data = read_tree(read_csv(csv_file, memmap=False))
+    assert all(isinstance(v, np.ndarray) for v in data.values())
+    assert np.allclose(data['a'] + 1, np.arange(3000)*0.1 + 1)
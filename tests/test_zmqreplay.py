@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip('zmq')
+pytest.importorskip('click')
+from bsmplot.bsm.zmqreplay import _unflatten, write_json, read_json
+
+
+def test_unflatten_list_index():
+    # the missing items are None, not compacted
+    frame = {'a.b': 1, 'c[0]': 2, 'c[2]': 4}
+    assert _unflatten(frame) == {'a': {'b': 1}, 'c': [2, None, 4]}
+
+
+def test_json_round_trip(tmp_path):
+    # the flattened frames in the ZMQ panel, with the frame id and the
+    # receive time
+    frames = [
+        ('', {'_frame_id': 1, '_time': 100.0, 'a.b': 1, 'c[0]': 2, 'c[1]': 3}),
+        ('gps', {'_frame_id': 2, '_time': 100.5, 'lat': 1.5, 'sat[1]': 7}),
+        ('', {'_frame_id': 3, '_time': 101.0, 'a.b': 2, 'c[0]': 4, 'c[1]': 5}),
+    ]
+    filename = tmp_path / 'session.json'
+    write_json(filename, frames)
+    assert list(read_json(filename)) == [
+        (100.0, '', {'a': {'b': 1}, 'c': [2, 3]}),
+        (100.5, 'gps', {'lat': 1.5, 'sat': [None, 7]}),
+        (101.0, '', {'a': {'b': 2}, 'c': [4, 5]}),
+    ]